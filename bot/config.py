@@ -6,7 +6,10 @@ from pathlib import Path
 @dataclass
 class Config:
     bot_token: str
-    cookies_path: str = "./cookies.txt"
+    cookies_path: str | list[str] = "./cookies.txt"
+    account_requests_per_second: float = 0
+    account_burst: int = 20
+    account_quarantine_seconds: int = 900
     admin_users: list[int] = field(default_factory=list)
     whitelist_users: list[int] = field(default_factory=list)
     whitelist_groups: list[int] = field(default_factory=list)
@@ -14,18 +17,55 @@ class Config:
 
     max_concurrent_per_user: int = 2
     max_concurrent_global: int = 5
+    max_concurrent_uploads: int = 5
+    collection_workers: int = 4
+    delivery_window: int = 8
+    delivery_max_wait_seconds: float = 60
+    priority_weight_single: float = 4
+    priority_weight_album: float = 2
+    priority_weight_playlist: float = 1
+    admin_priority_weight: float = 2
     max_concurrent_updates: int = 16
+    telegram_global_per_second: float = 30
+    telegram_private_chat_per_second: float = 1
+    telegram_group_chat_per_minute: float = 20
+    telegram_flood_retries: int = 3
     max_file_size_mb: int = 50
 
     database_path: str = "./data/cache.db"
+    database_read_connections: int = 4
     temp_path: str = "./data/temp"
+    cover_cache_path: str = "./data/covers"
+    cover_cache_memory_items: int = 256
+    cover_cache_disk_mb: int = 200
+
+    song_cache_size: int = 2048
+    cache_flush_interval_seconds: float = 5
+    cache_write_batch_size: int = 200
+    user_profile_ttl_seconds: int = 300
+    codec_availability_ttl_seconds: int = 604800
+    collection_ttl_seconds: int = 86400
+    download_queue_cache_seconds: int = 30
 
     song_codec: str = "aac-legacy"
     use_wrapper: bool = False
-    wrapper_url: str = "127.0.0.1:10020"
+    wrapper_url: str | list[str] = "127.0.0.1:10020"
+    wrapper_probe_timeout_seconds: float = 2
+    wrapper_failure_threshold: int = 3
+    wrapper_reset_timeout_seconds: int = 60
 
     health_check_interval_seconds: int = 300
 
+    @property
+    def cookies_paths(self) -> list[str]:
+        paths = self.cookies_path if isinstance(self.cookies_path, list) else [self.cookies_path]
+        return [path for path in paths if path] or ["./cookies.txt"]
+
+    @property
+    def wrapper_urls(self) -> list[str]:
+        urls = self.wrapper_url if isinstance(self.wrapper_url, list) else [self.wrapper_url]
+        return [url for url in urls if url] or ["127.0.0.1:10020"]
+
     @classmethod
     def load(cls, path: str = "config.yaml"):
         config_path = Path(path)
@@ -2,13 +2,15 @@ from telegram import Update, InputFile
 from telegram.ext import ContextTypes
 from telegram.error import TimedOut, NetworkError
 from pathlib import Path
-from typing import Optional
+from typing import Awaitable, Callable, Optional
 import logging
 import asyncio
+import time
 import re
 from gamdl.downloader.constants import ALBUM_MEDIA_TYPE
 
 from ..services.audit import log_user_action
+from ..middleware.concurrency import PRIORITY_ALBUM, PRIORITY_PLAYLIST, PRIORITY_SINGLE
 
 
 logger = logging.getLogger(__name__)
@@ -30,6 +32,71 @@ class FileTooLargeError(Exception):
     pass
 
 
+class OrderedDelivery:
+    def __init__(self, total: int, window: int, max_wait: float):
+        self.total = total
+        self.window = max(1, window)
+        self.max_wait = max_wait
+        self.next_index = 1
+        self.ready: dict[int, tuple[float, Optional[Callable[[], Awaitable]]]] = {}
+        self.delivered: set[int] = set()
+        self.changed = asyncio.Event()
+        self.window_condition = asyncio.Condition()
+        self.out_of_order = 0
+
+    async def wait_for_slot(self, idx: int):
+        async with self.window_condition:
+            await self.window_condition.wait_for(lambda: idx < self.next_index + self.window)
+
+    def complete(self, idx: int, send: Optional[Callable[[], Awaitable]] = None):
+        if idx < self.next_index or idx in self.ready or idx in self.delivered:
+            return
+        self.ready[idx] = (time.monotonic(), send)
+        self.changed.set()
+
+    async def _send(self, send: Optional[Callable[[], Awaitable]]):
+        if not send:
+            return
+        try:
+            await send()
+        except Exception:
+            logger.exception("Ordered delivery send failed")
+
+    async def _advance(self):
+        self.next_index += 1
+        async with self.window_condition:
+            self.window_condition.notify_all()
+
+    async def run(self):
+        while self.next_index <= self.total:
+            entry = self.ready.pop(self.next_index, None)
+            if entry or self.next_index in self.delivered:
+                self.delivered.discard(self.next_index)
+                if entry:
+                    await self._send(entry[1])
+                await self._advance()
+                continue
+
+            timeout = None
+            if self.ready:
+                oldest = min(ready_at for ready_at, _ in self.ready.values())
+                timeout = self.max_wait - (time.monotonic() - oldest)
+                if timeout <= 0:
+                    idx = min(self.ready)
+                    _, send = self.ready.pop(idx)
+                    self.delivered.add(idx)
+                    self.out_of_order += 1
+                    logger.info(f"Delivering track {idx} ahead of track {self.next_index} after {self.max_wait}s")
+                    await self._send(send)
+                    continue
+
+            self.changed.clear()
+            try:
+                await asyncio.wait_for(self.changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+
 async def safe_edit_status(status_msg, text):
     try:
         await status_msg.edit_text(text)
@@ -64,17 +131,23 @@ def is_group_chat(chat_id: int) -> bool:
     return chat_id < 0
 
 
-async def get_effective_codec(context: ContextTypes.DEFAULT_TYPE, user_id: int) -> str:
+async def get_user_profile(context: ContextTypes.DEFAULT_TYPE, user_id: int, profile=None):
+    if profile is not None:
+        return profile
     cache = context.bot_data['cache']
+    return await cache.get_user_profile(user_id)
+
+
+async def get_effective_codec(context: ContextTypes.DEFAULT_TYPE, user_id: int, profile=None) -> str:
     config = context.bot_data['config']
     downloader = context.bot_data['downloader']
-    codec = await cache.get_user_codec(user_id, config.song_codec)
-    return downloader.effective_codec(codec)
+    profile = await get_user_profile(context, user_id, profile)
+    return downloader.effective_codec(profile.download_codec or config.song_codec)
 
 
-async def get_send_lyrics(context: ContextTypes.DEFAULT_TYPE, user_id: int) -> bool:
-    cache = context.bot_data['cache']
-    return await cache.get_user_send_lyrics(user_id)
+async def get_send_lyrics(context: ContextTypes.DEFAULT_TYPE, user_id: int, profile=None) -> bool:
+    profile = await get_user_profile(context, user_id, profile)
+    return profile.send_lyrics
 
 
 def get_synced_lyrics_text(item) -> Optional[str]:
@@ -157,6 +230,132 @@ def format_track_label(item) -> str:
     return f"{title} - {artist}"
 
 
+async def send_cached_track_fast_path(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    url_info,
+    codec: str,
+    send_lyrics: bool,
+    status_msg=None,
+    message_id: Optional[int] = None
+) -> bool:
+    if send_lyrics:
+        return False
+
+    downloader = context.bot_data['downloader']
+    track_id = downloader.get_track_id(url_info)
+    if not track_id:
+        return False
+
+    cache = context.bot_data['cache']
+    cached = await cache.get_cached_song(track_id, codec)
+    if not cached:
+        return False
+
+    sender = context.bot_data['sender']
+    logger.info(f"Cache hit for {track_id} before metadata fetch")
+    if status_msg:
+        await safe_delete_status(status_msg)
+    await sender.send_cached_audio(context, update.effective_chat.id, cached['file_id'], cached, message_id)
+    await cache.update_user_activity(
+        update.effective_user.id,
+        update.effective_user.username,
+        update.effective_user.first_name
+    )
+    return True
+
+
+async def send_cached_collection_fast_path(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    url_info,
+    codec: str,
+    send_lyrics: bool,
+    is_album: bool = False,
+    status_msg=None,
+    message_id: Optional[int] = None
+) -> bool:
+    if send_lyrics:
+        return False
+
+    downloader = context.bot_data['downloader']
+    collection_key = downloader.get_collection_key(url_info)
+    if not collection_key:
+        return False
+
+    cache = context.bot_data['cache']
+    track_ids = await cache.get_collection_tracks(*collection_key)
+    if not track_ids:
+        return False
+
+    cached_songs = await cache.get_cached_songs(track_ids, codec)
+    if any(track_id not in cached_songs for track_id in track_ids):
+        return False
+
+    sender = context.bot_data['sender']
+    chat_id = update.effective_chat.id
+    songs = [cached_songs[track_id] for track_id in track_ids]
+    total = len(songs)
+    logger.info(f"Collection {collection_key[0]} fully cached ({total} songs), skipping metadata fetch")
+
+    if status_msg:
+        await safe_edit_status(status_msg, f"Found {total} cached songs, sending...")
+
+    processed = 0
+    sent_as_group = False
+    if is_album and 1 < total <= 10:
+        try:
+            media_group = [
+                await sender.build_input_media_audio(song, song['file_id'], include_thumbnail=False)
+                for song in songs
+            ]
+            responses = await context.bot.send_media_group(
+                chat_id=chat_id,
+                media=media_group,
+                reply_to_message_id=message_id
+            )
+            processed = len(responses)
+            sent_as_group = True
+        except Exception as e:
+            logger.exception(f"Failed to send cached media group, falling back to individual sends: {e}")
+
+    if not sent_as_group:
+        for song in songs:
+            try:
+                await sender.send_cached_audio(context, chat_id, song['file_id'], song, message_id)
+                processed += 1
+            except Exception as e:
+                logger.exception(f"Failed to send cached track {song['apple_music_id']}: {e}")
+
+    await cache.update_user_activity(
+        update.effective_user.id,
+        update.effective_user.username,
+        update.effective_user.first_name
+    )
+
+    if status_msg:
+        await safe_edit_status(status_msg, f"Complete! Processed: {processed}, Failed: {total - processed}")
+        asyncio.create_task(delete_status_after_delay(status_msg))
+    return True
+
+
+async def store_collection_manifest(context: ContextTypes.DEFAULT_TYPE, url_info, download_queue: list):
+    downloader = context.bot_data['downloader']
+    collection_key = downloader.get_collection_key(url_info)
+    if not collection_key or not download_queue:
+        return
+
+    cache = context.bot_data['cache']
+    track_ids = [
+        item.media_metadata['id'] for item in download_queue
+        if item.media_metadata and item.media_metadata.get('id')
+    ]
+    try:
+        await cache.store_collection(*collection_key, track_ids)
+    except Exception as e:
+        logger.warning(f"Failed to store collection manifest {collection_key[0]}: {e}")
+
+
 def extract_apple_music_urls(text: str) -> list[str]:
     url_pattern = r'https?://(?:music\.apple\.com|apple\.co)/[^\s]+'
     urls = re.findall(url_pattern, text, re.IGNORECASE)
@@ -192,6 +391,7 @@ async def link_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     whitelist = context.bot_data['whitelist']
     config = context.bot_data['config']
 
+    profile = None
     if is_group_chat(chat_id):
         logger.info(f"Group message detected: chat_id={chat_id}, user_id={user_id}")
         logger.info(f"Whitelisted groups: {whitelist.whitelist_groups}")
@@ -207,7 +407,8 @@ async def link_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         log_user_action(update, "access_allowed", scope="group")
         logger.info(f"Processing Apple Music link in group {chat_id}")
     else:
-        if not await whitelist(update, context):
+        profile = await cache.get_user_profile(user_id)
+        if not await whitelist(update, context, profile):
             return
 
     urls = extract_apple_music_urls(message_text)
@@ -216,13 +417,14 @@ async def link_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     log_user_action(update, "apple_music_urls_found", count=len(urls))
+    profile = await get_user_profile(context, user_id, profile)
     if len(urls) == 1:
-        await process_single_url(update, context, urls[0])
+        await process_single_url(update, context, urls[0], profile)
     else:
-        await process_multiple_urls(update, context, urls)
+        await process_multiple_urls(update, context, urls, profile)
 
 
-async def process_single_url(update: Update, context: ContextTypes.DEFAULT_TYPE, url: str):
+async def process_single_url(update: Update, context: ContextTypes.DEFAULT_TYPE, url: str, profile=None):
     message = update.effective_message
     downloader = context.bot_data['downloader']
     chat_id = update.effective_chat.id
@@ -243,12 +445,19 @@ async def process_single_url(update: Update, context: ContextTypes.DEFAULT_TYPE,
         ('/album/' in url.lower())
     )
 
-    await safe_edit_status(status_msg, "Fetching song information...")
-
     try:
-        codec = await get_effective_codec(context, update.effective_user.id)
-        send_lyrics = await get_send_lyrics(context, update.effective_user.id)
+        codec = await get_effective_codec(context, update.effective_user.id, profile)
+        send_lyrics = await get_send_lyrics(context, update.effective_user.id, profile)
+        if await send_cached_track_fast_path(update, context, url_info, codec, send_lyrics, status_msg, reply_to):
+            return
+        if await send_cached_collection_fast_path(
+            update, context, url_info, codec, send_lyrics, is_album_request, status_msg, reply_to
+        ):
+            return
+
+        await safe_edit_status(status_msg, "Fetching song information...")
         download_queue = await downloader.get_download_queue(url_info, codec, send_lyrics)
+        await store_collection_manifest(context, url_info, download_queue)
 
         if not download_queue:
             await send_message_with_retry(
@@ -274,7 +483,7 @@ async def process_single_url(update: Update, context: ContextTypes.DEFAULT_TYPE,
             logger.error("Failed to send error message to user")
 
 
-async def process_multiple_urls(update: Update, context: ContextTypes.DEFAULT_TYPE, urls: list[str]):
+async def process_multiple_urls(update: Update, context: ContextTypes.DEFAULT_TYPE, urls: list[str], profile=None):
     message = update.effective_message
     downloader = context.bot_data['downloader']
     chat_id = update.effective_chat.id
@@ -289,6 +498,8 @@ async def process_multiple_urls(update: Update, context: ContextTypes.DEFAULT_TY
 
     processed = 0
     failed = 0
+    codec = await get_effective_codec(context, update.effective_user.id, profile)
+    send_lyrics = await get_send_lyrics(context, update.effective_user.id, profile)
 
     for idx, url in enumerate(urls, 1):
         try:
@@ -300,9 +511,15 @@ async def process_multiple_urls(update: Update, context: ContextTypes.DEFAULT_TY
                 failed += 1
                 continue
 
-            codec = await get_effective_codec(context, update.effective_user.id)
-            send_lyrics = await get_send_lyrics(context, update.effective_user.id)
+            if await send_cached_track_fast_path(update, context, url_info, codec, send_lyrics, message_id=reply_to):
+                processed += 1
+                continue
+            if await send_cached_collection_fast_path(update, context, url_info, codec, send_lyrics, message_id=reply_to):
+                processed += 1
+                continue
+
             download_queue = await downloader.get_download_queue(url_info, codec, send_lyrics)
+            await store_collection_manifest(context, url_info, download_queue)
             if not download_queue:
                 logger.warning(f"No songs found for URL {idx}/{total_urls}: {url}")
                 failed += 1
@@ -392,13 +609,17 @@ async def handle_single_track(
 
     file_path = None
     acquired_concurrency = False
+    acquired_upload = False
     try:
-        await concurrency.acquire(user_id)
+        if concurrency.would_wait(user_id):
+            position = concurrency.queue_position(user_id, PRIORITY_SINGLE)
+            await safe_edit_status(status_msg, f"Queued for download (position {position})...")
+        await concurrency.acquire(user_id, PRIORITY_SINGLE)
         acquired_concurrency = True
 
         await safe_edit_status(status_msg, f"Downloading: {format_track_label(item)}")
 
-        file_path, fallback_message = await downloader.download_track(item, codec=codec, include_lyrics=send_lyrics)
+        file_path, fallback_message, delivered_codec = await downloader.download_track(item, codec=codec, include_lyrics=send_lyrics)
 
         if not file_path or not Path(file_path).exists():
             raise FileNotFoundError(f"Downloaded file not found at: {file_path}")
@@ -412,7 +633,12 @@ async def handle_single_track(
                 f"Maximum size is {config.max_file_size_mb}MB."
             )
 
+        concurrency.release(user_id)
+        acquired_concurrency = False
+
         await safe_edit_status(status_msg, "Uploading...")
+        await concurrency.acquire_upload()
+        acquired_upload = True
 
         metadata = downloader.extract_metadata(item)
         message = await sender.send_audio(context, chat_id, file_path, metadata, message_id)
@@ -424,7 +650,8 @@ async def handle_single_track(
                 codec,
                 message.audio.file_id,
                 message.audio.file_unique_id,
-                file_size
+                file_size,
+                delivered_codec
             )
         except Exception as e:
             logger.error(f"Failed to cache song {apple_music_id}: {e}")
@@ -453,6 +680,8 @@ async def handle_single_track(
             owns_upload_lock = False
         if acquired_concurrency:
             concurrency.release(user_id)
+        if acquired_upload:
+            concurrency.release_upload()
         if file_path and Path(file_path).exists():
             Path(file_path).unlink()
         lyrics_path = get_lyrics_path(item, file_path, config.temp_path) if file_path else None
@@ -475,23 +704,40 @@ async def process_track_item(
     progress_counter: dict,
     message_id: Optional[int] = None,
     codec: Optional[str] = None,
-    send_lyrics: Optional[bool] = None
+    send_lyrics: Optional[bool] = None,
+    cached: Optional[dict] = None,
+    priority: int = PRIORITY_ALBUM,
+    delivery: Optional[OrderedDelivery] = None
 ):
     if item.error:
         progress_counter['failed'] += 1
         return
 
+    async def deliver(send):
+        if delivery:
+            delivery.complete(idx, send)
+        else:
+            await send()
+
+    def cached_sender(file_id: str, metadata: dict):
+        async def send():
+            try:
+                await sender.send_cached_audio(context, chat_id, file_id, metadata, message_id)
+                await send_lyrics_if_enabled(context, chat_id, item, send_lyrics, message_id=message_id)
+                progress_counter['processed'] += 1
+            except Exception:
+                progress_counter['failed'] += 1
+                raise
+        return send
+
     try:
         apple_music_id = item.media_metadata['id']
         codec = codec or await get_effective_codec(context, user_id)
         send_lyrics = send_lyrics if send_lyrics is not None else await get_send_lyrics(context, user_id)
         upload_key = f"{apple_music_id}:{codec}"
 
-        cached = await cache.get_cached_song(apple_music_id, codec)
         if cached:
-            await sender.send_cached_audio(context, chat_id, cached['file_id'], cached, message_id)
-            await send_lyrics_if_enabled(context, chat_id, item, send_lyrics, message_id=message_id)
-            progress_counter['processed'] += 1
+            await deliver(cached_sender(cached['file_id'], cached))
             return
 
         owns_upload_lock = await sender.acquire_upload_lock(upload_key)
@@ -499,20 +745,19 @@ async def process_track_item(
             await sender.wait_for_upload(upload_key)
             cached = await cache.get_cached_song(apple_music_id, codec)
             if cached:
-                await sender.send_cached_audio(context, chat_id, cached['file_id'], cached, message_id)
-                await send_lyrics_if_enabled(context, chat_id, item, send_lyrics, message_id=message_id)
-                progress_counter['processed'] += 1
+                await deliver(cached_sender(cached['file_id'], cached))
                 return
             owns_upload_lock = await sender.acquire_upload_lock(upload_key)
 
         file_path = None
         acquired_concurrency = False
+        acquired_upload = False
         try:
-            await concurrency.acquire(user_id)
+            await concurrency.acquire(user_id, priority)
             acquired_concurrency = True
 
             progress_counter['current'] = format_track_label(item)
-            file_path, fallback_message = await downloader.download_track(item, codec=codec, include_lyrics=send_lyrics)
+            file_path, fallback_message, delivered_codec = await downloader.download_track(item, codec=codec, include_lyrics=send_lyrics)
 
             if not file_path or not Path(file_path).exists():
                 raise FileNotFoundError(f"Downloaded file not found at: {file_path}")
@@ -525,9 +770,25 @@ async def process_track_item(
                 progress_counter['failed'] += 1
                 return
 
+            concurrency.release(user_id)
+            acquired_concurrency = False
+            await concurrency.acquire_upload()
+            acquired_upload = True
+
             metadata = downloader.extract_metadata(item)
-            message = await sender.send_audio(context, chat_id, file_path, metadata, message_id)
-            await send_lyrics_if_enabled(context, chat_id, item, send_lyrics, file_path, message_id)
+            message = None
+            if delivery:
+                try:
+                    message = await sender.send_audio(context, config.archive_channel, file_path, metadata)
+                except Exception as upload_err:
+                    logger.warning(f"Upload to archive channel failed, sending directly: {upload_err}")
+
+            if message and message.audio:
+                await deliver(cached_sender(message.audio.file_id, metadata))
+            else:
+                message = await sender.send_audio(context, chat_id, file_path, metadata, message_id)
+                await send_lyrics_if_enabled(context, chat_id, item, send_lyrics, file_path, message_id)
+                progress_counter['processed'] += 1
 
             try:
                 await cache.store_song(
@@ -535,19 +796,20 @@ async def process_track_item(
                     codec,
                     message.audio.file_id,
                     message.audio.file_unique_id,
-                    file_size
+                    file_size,
+                    delivered_codec
                 )
             except Exception as e:
                 logger.error(f"Failed to cache song {apple_music_id}: {e}")
 
-            progress_counter['processed'] += 1
-
         finally:
             if owns_upload_lock:
                 await sender.release_upload_lock(upload_key)
                 owns_upload_lock = False
             if acquired_concurrency:
                 concurrency.release(user_id)
+            if acquired_upload:
+                concurrency.release_upload()
             if file_path and Path(file_path).exists():
                 Path(file_path).unlink()
             lyrics_path = get_lyrics_path(item, file_path, config.temp_path) if file_path else None
@@ -584,8 +846,11 @@ async def handle_album_media_group(
 
     await safe_edit_status(status_msg, f"Found {total} songs, sending as album...")
 
-    prepared_entries = []
-    individual_entries = []
+    cached_songs = await cache.get_cached_songs(
+        [item.media_metadata['id'] for item in download_queue if not item.error],
+        codec
+    )
+
     failed = 0
     max_size = config.max_file_size_mb * 1024 * 1024
     archive_channel = getattr(config, 'archive_channel', '@applemusicachive')
@@ -615,20 +880,25 @@ async def handle_album_media_group(
                 metadata = entry['metadata']
                 if entry.get('needs_upload'):
                     upload_source = entry.get('file_path') or entry['file_id']
-                    message = await sender.send_audio(
-                        context,
-                        chat_id,
-                        upload_source,
-                        metadata,
-                        message_id
-                    )
+                    await concurrency.acquire_upload()
+                    try:
+                        message = await sender.send_audio(
+                            context,
+                            chat_id,
+                            upload_source,
+                            metadata,
+                            message_id
+                        )
+                    finally:
+                        concurrency.release_upload()
                     if message and message.audio:
                         await cache.store_song(
                             metadata,
                             codec,
                             message.audio.file_id,
                             message.audio.file_unique_id,
-                            entry.get('file_size', 0)
+                            entry.get('file_size', 0),
+                            entry.get('delivered_codec')
                         )
                 else:
                     await sender.send_cached_audio(context, chat_id, entry['file_id'], metadata, message_id)
@@ -645,98 +915,166 @@ async def handle_album_media_group(
                 logger.exception(f"Failed to send track individually: {e}")
         return processed
 
+    prepared_slots: dict[int, dict] = {}
+    individual_slots: dict[int, dict] = {}
+    stage = {'downloaded': 0, 'uploaded': 0, 'upload_failed': 0, 'failed': 0}
+    to_prepare = 0
+
     for idx, item in enumerate(download_queue, 1):
         if item.error:
             failed += 1
             continue
 
         metadata = downloader.extract_metadata(item)
-        apple_music_id = metadata['apple_music_id']
-        await safe_edit_status(
-            status_msg,
-            f"Preparing album: {idx}/{total}\nProcessing: {metadata['title']} - {metadata['artist']}"
-        )
-
-        cached = await cache.get_cached_song(apple_music_id, codec)
+        cached = cached_songs.get(metadata['apple_music_id'])
         if cached and cached.get('file_id'):
-            prepared_entries.append({
+            prepared_slots[idx] = {
                 'metadata': metadata,
                 'item': item,
                 'file_id': cached['file_id'],
                 'is_cached': True
-            })
+            }
             continue
+        to_prepare += 1
 
-        file_path = None
-        acquired = False
-        
-        try:
-            await concurrency.acquire(user_id)
-            acquired = True
+    pending_items = (
+        (idx, item) for idx, item in enumerate(download_queue, 1)
+        if not item.error and idx not in prepared_slots
+    )
+    upload_workers = max(1, min(to_prepare, config.max_concurrent_uploads))
+    upload_queue: asyncio.Queue = asyncio.Queue(maxsize=upload_workers)
 
-            file_path, fallback_message = await downloader.download_track(item, codec=codec, include_lyrics=send_lyrics)
-            path_obj = Path(file_path)
+    async def update_album_progress():
+        last_text = None
+        while True:
+            new_text = (
+                f"Preparing album: downloaded {stage['downloaded']}/{to_prepare}, "
+                f"uploaded {stage['uploaded']}/{to_prepare}"
+                + (f", upload failed {stage['upload_failed']}" if stage['upload_failed'] else "")
+                + (f", failed {stage['failed']}" if stage['failed'] else "")
+            )
+            if new_text != last_text:
+                await safe_edit_status(status_msg, new_text)
+                last_text = new_text
+            await asyncio.sleep(2)
 
-            if not path_obj.exists():
-                raise FileNotFoundError(f"Downloaded file not found at: {file_path}")
+    def discard_download(item, file_path):
+        if file_path and Path(file_path).exists():
+            Path(file_path).unlink()
+        lyrics_path = get_lyrics_path(item, file_path, config.temp_path) if file_path else None
+        if lyrics_path and lyrics_path.exists():
+            lyrics_path.unlink()
 
-            file_size = path_obj.stat().st_size
+    async def download_worker():
+        for idx, item in pending_items:
+            metadata = downloader.extract_metadata(item)
+            file_path = None
+            acquired = False
+            try:
+                await concurrency.acquire(user_id, PRIORITY_ALBUM)
+                acquired = True
 
-            if file_size > max_size:
-                logger.warning(f"Skipping {metadata['title']}: file too large for group send")
-                failed += 1
-                path_obj.unlink()
-                continue
+                file_path, fallback_message, delivered_codec = await downloader.download_track(item, codec=codec, include_lyrics=send_lyrics)
+                path_obj = Path(file_path)
 
-            channel_message = None
-            try:
-                channel_message = await sender.send_audio(
-                    context,
-                    archive_channel,
-                    file_path,
-                    metadata
-                )
-            except Exception as upload_err:
-                logger.warning(f"Upload to archive channel failed, will send directly: {upload_err}")
+                if not path_obj.exists():
+                    raise FileNotFoundError(f"Downloaded file not found at: {file_path}")
 
-            if channel_message and channel_message.audio:
-                prepared_entries.append({
-                    'metadata': metadata,
-                    'item': item,
-                    'file_id': channel_message.audio.file_id,
-                    'file_path': file_path,
-                    'file_size': file_size,
-                    'fallback_message': fallback_message
-                })
+                file_size = path_obj.stat().st_size
 
-                await cache.store_song(
-                    metadata,
-                    codec,
-                    channel_message.audio.file_id,
-                    channel_message.audio.file_unique_id,
-                    file_size
-                )
-            else:
-                individual_entries.append({
+                if file_size > max_size:
+                    logger.warning(f"Skipping {metadata['title']}: file too large for group send")
+                    stage['failed'] += 1
+                    path_obj.unlink()
+                    continue
+
+                concurrency.release(user_id)
+                acquired = False
+                stage['downloaded'] += 1
+
+                await upload_queue.put((idx, {
                     'metadata': metadata,
                     'item': item,
                     'file_path': file_path,
                     'file_size': file_size,
-                    'needs_upload': True,
-                    'fallback_message': fallback_message
-                })
+                    'fallback_message': fallback_message,
+                    'delivered_codec': delivered_codec
+                }))
+                file_path = None
 
-        except Exception as e:
-            failed += 1
-            logger.exception(f"Error preparing track for album group: {e}")
-            if file_path and Path(file_path).exists():
-                Path(file_path).unlink()
-            lyrics_path = get_lyrics_path(item, file_path, config.temp_path) if file_path else None
-            if lyrics_path and lyrics_path.exists():
-                lyrics_path.unlink()
+            except Exception as e:
+                stage['failed'] += 1
+                logger.exception(f"Error preparing track for album group: {e}")
+                discard_download(item, file_path)
+            finally:
+                if acquired:
+                    concurrency.release(user_id)
+
+    async def upload_worker():
+        while True:
+            idx, entry = await upload_queue.get()
+            try:
+                channel_message = None
+                await concurrency.acquire_upload()
+                try:
+                    channel_message = await sender.send_audio(
+                        context,
+                        archive_channel,
+                        entry['file_path'],
+                        entry['metadata']
+                    )
+                except Exception as upload_err:
+                    logger.warning(f"Upload to archive channel failed, will send directly: {upload_err}")
+                finally:
+                    concurrency.release_upload()
+
+                if channel_message and channel_message.audio:
+                    entry['file_id'] = channel_message.audio.file_id
+                    prepared_slots[idx] = entry
+                    try:
+                        await cache.store_song(
+                            entry['metadata'],
+                            codec,
+                            channel_message.audio.file_id,
+                            channel_message.audio.file_unique_id,
+                            entry['file_size'],
+                            entry.get('delivered_codec')
+                        )
+                    except Exception as e:
+                        logger.error(f"Failed to cache song {entry['metadata']['apple_music_id']}: {e}")
+                    stage['uploaded'] += 1
+                else:
+                    entry['needs_upload'] = True
+                    individual_slots[idx] = entry
+                    stage['upload_failed'] += 1
+            except Exception as e:
+                stage['failed'] += 1
+                logger.exception(f"Error uploading track for album group: {e}")
+                discard_download(entry['item'], entry['file_path'])
+            finally:
+                upload_queue.task_done()
+
+    if to_prepare:
+        progress_task = asyncio.create_task(update_album_progress())
+        uploaders = [asyncio.create_task(upload_worker()) for _ in range(upload_workers)]
+        download_tasks = [
+            asyncio.create_task(download_worker())
+            for _ in range(max(1, min(to_prepare, config.collection_workers)))
+        ]
+        try:
+            await asyncio.gather(*download_tasks, return_exceptions=True)
+            await upload_queue.join()
         finally:
-            if acquired:
-                concurrency.release(user_id)
+            for task in uploaders + [progress_task]:
+                task.cancel()
+            await asyncio.gather(*uploaders, progress_task, return_exceptions=True)
+            while not upload_queue.empty():
+                _, entry = upload_queue.get_nowait()
+                discard_download(entry['item'], entry['file_path'])
+
+    failed += stage['failed']
+    prepared_entries = [prepared_slots[idx] for idx in sorted(prepared_slots)]
+    individual_entries = [individual_slots[idx] for idx in sorted(individual_slots)]
 
     if not prepared_entries and not individual_entries:
         cleanup_entries(prepared_entries)
@@ -763,7 +1101,7 @@ async def handle_album_media_group(
     processed = 0
     send_failures = 0
     try:
-        await safe_edit_status(status_msg, f"Prepared {len(prepared_entries)} songs, uploading...")
+        await safe_edit_status(status_msg, f"Prepared {len(prepared_entries)} songs, sending album...")
         media_group = []
         for entry in prepared_entries:
             media_source = entry['file_id']
@@ -796,7 +1134,8 @@ async def handle_album_media_group(
                     codec,
                     message.audio.file_id,
                     message.audio.file_unique_id,
-                    entry['file_size']
+                    entry['file_size'],
+                    entry.get('delivered_codec')
                 )
             await send_lyrics_if_enabled(
                 context,
@@ -897,21 +1236,62 @@ async def handle_collection(
 
     await safe_edit_status(status_msg, f"Found {total} songs, downloading...")
 
+    cached_songs = await cache.get_cached_songs(
+        [item.media_metadata['id'] for item in download_queue if not item.error],
+        codec
+    )
+    logger.info(f"Collection cache partition: {len(cached_songs)} cached, {total - len(cached_songs)} uncached")
+
     progress_task = asyncio.create_task(update_progress())
+    priority = (
+        PRIORITY_PLAYLIST
+        if any(getattr(item, 'playlist_metadata', None) for item in download_queue)
+        else PRIORITY_ALBUM
+    )
 
-    tasks = [
-        process_track_item(
-            item, idx, total, user_id, chat_id,
-            downloader, cache, sender, concurrency, config, context,
-            progress_counter,
-            message_id,
-            codec,
-            send_lyrics
-        )
-        for idx, item in enumerate(download_queue, 1)
-    ]
+    pending_items = enumerate(download_queue, 1)
+    delivery = None
+    delivery_task = None
+    if config.delivery_window > 0 and total > 1:
+        delivery = OrderedDelivery(total, config.delivery_window, config.delivery_max_wait_seconds)
+        delivery_task = asyncio.create_task(delivery.run())
+
+    async def collection_worker():
+        for idx, item in pending_items:
+            if delivery:
+                await delivery.wait_for_slot(idx)
+            try:
+                await process_track_item(
+                    item, idx, total, user_id, chat_id,
+                    downloader, cache, sender, concurrency, config, context,
+                    progress_counter,
+                    message_id,
+                    codec,
+                    send_lyrics,
+                    cached_songs.get(item.media_metadata['id']) if not item.error else None,
+                    priority,
+                    delivery
+                )
+            except Exception:
+                logger.exception(f"Error processing track {idx}/{total}")
+                progress_counter['failed'] += 1
+            finally:
+                if delivery:
+                    delivery.complete(idx)
 
-    await asyncio.gather(*tasks, return_exceptions=True)
+    worker_count = max(1, min(total, config.collection_workers))
+    workers = [asyncio.create_task(collection_worker()) for _ in range(worker_count)]
+    try:
+        await asyncio.gather(*workers, return_exceptions=True)
+        if delivery_task:
+            await delivery_task
+            if delivery.out_of_order:
+                logger.info(f"Collection delivered with {delivery.out_of_order} track(s) out of order")
+    finally:
+        pending_tasks = [task for task in workers + [delivery_task] if task and not task.done()]
+        for task in pending_tasks:
+            task.cancel()
+        await asyncio.gather(*pending_tasks, return_exceptions=True)
 
     progress_task.cancel()
     try:
@@ -16,9 +16,16 @@ from .models.database import Database
 from .services.downloader import DownloaderService
 from .services.cache import CacheService
 from .services.sender import SenderService
+from .services.cover_cache import CoverCache
+from .services.rate_limit import TelegramRateLimiter
 from .services.health import health_check_loop, notify_admins, systemd_notify, watchdog_loop
 from .middleware.whitelist import WhitelistMiddleware
-from .middleware.concurrency import ConcurrencyMiddleware
+from .middleware.concurrency import (
+    ConcurrencyMiddleware,
+    PRIORITY_ALBUM,
+    PRIORITY_PLAYLIST,
+    PRIORITY_SINGLE,
+)
 from .handlers.start import help_handler, start_handler
 from .handlers.link import link_handler
 from .handlers.settings import allow_handler, codec_handler, deny_handler, list_handler, lyrics_handler
@@ -66,6 +73,22 @@ async def configure_bot_commands(application, config):
 
 
 async def shutdown_handler(application):
+    cache = application.bot_data.get('cache')
+    if cache:
+        logger.info("Flushing pending cache writes...")
+        try:
+            await cache.flush()
+        except Exception as e:
+            logger.error(f"Failed to flush pending cache writes: {e}")
+        logger.info(f"Song cache stats: {cache.get_stats()}")
+
+    sender = application.bot_data.get('sender')
+    if sender:
+        if sender.cover_cache:
+            logger.info(f"Cover cache stats: {sender.cover_cache.get_stats()}")
+        logger.info("Closing HTTP client...")
+        await sender.close()
+
     db = application.bot_data.get('db')
     if db:
         logger.info("Closing database connection...")
@@ -80,13 +103,23 @@ async def main():
     config = Config.load()
     logger.info(f"Config loaded from config.yaml")
 
-    db = Database(config.database_path)
+    db = Database(config.database_path, read_connections=config.database_read_connections)
     await db.initialize()
     logger.info(f"Database initialized at {config.database_path}")
 
-    downloader = DownloaderService(config)
+    cache = CacheService(
+        db,
+        song_cache_size=config.song_cache_size,
+        flush_interval_seconds=config.cache_flush_interval_seconds,
+        write_batch_size=config.cache_write_batch_size,
+        user_profile_ttl_seconds=config.user_profile_ttl_seconds,
+        codec_availability_ttl_seconds=config.codec_availability_ttl_seconds,
+        collection_ttl_seconds=config.collection_ttl_seconds
+    )
+
+    downloader = DownloaderService(config, cache)
     await downloader.initialize()
-    logger.info(f"Downloader service initialized with cookies from {config.cookies_path}")
+    logger.info(f"Downloader service initialized with cookies from {', '.join(account.name for account in downloader.accounts)}")
     logger.info(f"Subscription active: {downloader.apple_music_api.active_subscription}")
     logger.info(f"Storefront: {downloader.apple_music_api.storefront}")
     logger.info(f"Default codec: {downloader.normalize_codec(config.song_codec).upper()}")
@@ -96,8 +129,13 @@ async def main():
     else:
         logger.info("Wrapper availability: DISABLED (wrapper-only codecs fall back to AAC)")
 
-    cache = CacheService(db)
-    sender = SenderService()
+    cover_cache = CoverCache(
+        config.cover_cache_path,
+        memory_items=config.cover_cache_memory_items,
+        disk_max_bytes=config.cover_cache_disk_mb * 1024 * 1024
+    )
+    cover_cache.initialize()
+    sender = SenderService(cover_cache)
     whitelist = WhitelistMiddleware(
         config.whitelist_users,
         config.whitelist_groups,
@@ -106,18 +144,35 @@ async def main():
     )
     concurrency = ConcurrencyMiddleware(
         max_per_user=config.max_concurrent_per_user,
-        max_global=config.max_concurrent_global
+        max_global=config.max_concurrent_global,
+        max_uploads=config.max_concurrent_uploads,
+        admin_users=config.admin_users,
+        admin_weight=config.admin_priority_weight,
+        priority_weights={
+            PRIORITY_SINGLE: config.priority_weight_single,
+            PRIORITY_ALBUM: config.priority_weight_album,
+            PRIORITY_PLAYLIST: config.priority_weight_playlist,
+        }
     )
 
     logger.info(
         f"Whitelist: {len(config.whitelist_users)} users, "
         f"{len(config.whitelist_groups)} groups, {len(config.admin_users)} admins"
     )
-    logger.info(f"Concurrency limits: {config.max_concurrent_per_user} per user, {config.max_concurrent_global} global")
+    logger.info(
+        f"Concurrency limits: {config.max_concurrent_per_user} per user, "
+        f"{config.max_concurrent_global} global downloads, {config.max_concurrent_uploads} uploads"
+    )
     logger.info(f"Telegram update concurrency: {config.max_concurrent_updates}")
 
     Path(config.temp_path).mkdir(parents=True, exist_ok=True)
 
+    rate_limiter = TelegramRateLimiter(
+        global_per_second=config.telegram_global_per_second,
+        private_chat_per_second=config.telegram_private_chat_per_second,
+        group_chat_per_minute=config.telegram_group_chat_per_minute,
+        max_retries=config.telegram_flood_retries
+    )
     request = HTTPXRequest(
         connection_pool_size=8,
         connect_timeout=60.0,
@@ -129,6 +184,7 @@ async def main():
         Application.builder()
         .token(config.bot_token)
         .request(request)
+        .rate_limiter(rate_limiter)
         .concurrent_updates(config.max_concurrent_updates)
         .build()
     )
@@ -140,6 +196,7 @@ async def main():
     application.bot_data['sender'] = sender
     application.bot_data['whitelist'] = whitelist
     application.bot_data['concurrency'] = concurrency
+    application.bot_data['rate_limiter'] = rate_limiter
 
     application.add_handler(CommandHandler("start", start_handler))
     application.add_handler(CommandHandler("help", help_handler))
@@ -162,6 +219,8 @@ async def main():
 
     health_task = asyncio.create_task(health_check_loop(application))
     watchdog_task = asyncio.create_task(watchdog_loop(application))
+    cache_flush_task = asyncio.create_task(cache.flush_loop())
+    token_refresh_task = asyncio.create_task(downloader.token_refresh_loop())
 
     try:
         await asyncio.Event().wait()
@@ -171,7 +230,15 @@ async def main():
         logger.info("Stopping bot...")
         health_task.cancel()
         watchdog_task.cancel()
-        await asyncio.gather(health_task, watchdog_task, return_exceptions=True)
+        cache_flush_task.cancel()
+        token_refresh_task.cancel()
+        await asyncio.gather(
+            health_task,
+            watchdog_task,
+            cache_flush_task,
+            token_refresh_task,
+            return_exceptions=True
+        )
         await notify_admins(application, "Apple Music Download Bot is stopping.")
         await application.updater.stop()
         await application.stop()
@@ -1,24 +1,229 @@
 import asyncio
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+
+
+PRIORITY_SINGLE = 0
+PRIORITY_ALBUM = 1
+PRIORITY_PLAYLIST = 2
+PRIORITY_NAMES = {
+    PRIORITY_SINGLE: "single",
+    PRIORITY_ALBUM: "album",
+    PRIORITY_PLAYLIST: "playlist",
+}
+DEFAULT_PRIORITY_WEIGHTS = {
+    PRIORITY_SINGLE: 4.0,
+    PRIORITY_ALBUM: 2.0,
+    PRIORITY_PLAYLIST: 1.0,
+}
+
+
+@dataclass
+class _Waiter:
+    future: asyncio.Future
+    priority: int
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+@dataclass
+class _UserQueue:
+    user_id: int
+    weight: float
+    active: int = 0
+    deficit: float = 0.0
+    waiters: dict[int, deque] = field(
+        default_factory=lambda: {priority: deque() for priority in PRIORITY_NAMES}
+    )
+
+    def head(self) -> _Waiter | None:
+        for priority in sorted(self.waiters):
+            queue = self.waiters[priority]
+            while queue and queue[0].future.done():
+                queue.popleft()
+            if queue:
+                return queue[0]
+        return None
+
+    def pending(self) -> int:
+        return sum(
+            1 for queue in self.waiters.values() for waiter in queue if not waiter.future.done()
+        )
 
 
 class ConcurrencyMiddleware:
-    def __init__(self, max_per_user: int = 2, max_global: int = 5):
+    def __init__(
+        self,
+        max_per_user: int = 2,
+        max_global: int = 5,
+        max_uploads: int = 5,
+        admin_users: list[int] | None = None,
+        admin_weight: float = 2.0,
+        priority_weights: dict[int, float] | None = None
+    ):
         self.max_per_user = max_per_user
         self.max_global = max_global
-        self.user_semaphores: dict[int, asyncio.Semaphore] = {}
-        self.global_semaphore = asyncio.Semaphore(max_global)
+        self.max_uploads = max_uploads
+        self.admin_users = set(admin_users or [])
+        self.admin_weight = admin_weight
+        self.priority_weights = {**DEFAULT_PRIORITY_WEIGHTS, **(priority_weights or {})}
+        self.users: dict[int, _UserQueue] = {}
+        self.backlog: OrderedDict[int, _UserQueue] = OrderedDict()
+        self.active_global = 0
+        self.upload_semaphore = asyncio.Semaphore(max_uploads)
+        self.stats = {
+            'granted': 0,
+            'queued': 0,
+            'evicted': 0,
+            'max_wait_seconds': 0.0,
+        }
+
+    def _get_user(self, user_id: int) -> _UserQueue:
+        state = self.users.get(user_id)
+        if not state:
+            weight = self.admin_weight if user_id in self.admin_users else 1.0
+            state = _UserQueue(user_id, weight)
+            self.users[user_id] = state
+        return state
+
+    def _evict_if_idle(self, state: _UserQueue):
+        if state.active == 0 and state.head() is None:
+            self.backlog.pop(state.user_id, None)
+            if self.users.pop(state.user_id, None):
+                self.stats['evicted'] += 1
+
+    def _quantum(self, state: _UserQueue, waiter: _Waiter) -> float:
+        return max(0.1, self.priority_weights.get(waiter.priority, 1.0) * state.weight)
 
-    def _get_user_semaphore(self, user_id: int) -> asyncio.Semaphore:
-        if user_id not in self.user_semaphores:
-            self.user_semaphores[user_id] = asyncio.Semaphore(self.max_per_user)
-        return self.user_semaphores[user_id]
+    def _next_user(self) -> _UserQueue | None:
+        for state in list(self.backlog.values()):
+            if state.head() is None:
+                self.backlog.pop(state.user_id, None)
+                state.deficit = 0.0
+                self._evict_if_idle(state)
+        if not any(state.active < self.max_per_user for state in self.backlog.values()):
+            return None
 
-    async def acquire(self, user_id: int):
-        user_sem = self._get_user_semaphore(user_id)
-        await user_sem.acquire()
-        await self.global_semaphore.acquire()
+        while True:
+            state = next(iter(self.backlog.values()))
+            if state.active >= self.max_per_user:
+                state.deficit = 0.0
+                self.backlog.move_to_end(state.user_id)
+                continue
+            if state.deficit < 1:
+                state.deficit += self._quantum(state, state.head())
+                if state.deficit < 1:
+                    self.backlog.move_to_end(state.user_id)
+                    continue
+            return state
+
+    def _dispatch(self):
+        while self.active_global < self.max_global:
+            state = self._next_user()
+            if not state:
+                return
+            waiter = state.head()
+            self._remove_waiter(state, waiter)
+            state.deficit -= 1
+            state.active += 1
+            self.active_global += 1
+            self.stats['granted'] += 1
+            self.stats['max_wait_seconds'] = max(
+                self.stats['max_wait_seconds'],
+                time.monotonic() - waiter.enqueued_at
+            )
+            waiter.future.set_result(True)
+
+            if state.head() is None:
+                self.backlog.pop(state.user_id, None)
+                state.deficit = 0.0
+            elif state.deficit < 1:
+                self.backlog.move_to_end(state.user_id)
+
+    def _remove_waiter(self, state: _UserQueue, waiter: _Waiter):
+        queue = state.waiters[waiter.priority]
+        try:
+            queue.remove(waiter)
+        except ValueError:
+            pass
+
+    async def acquire(self, user_id: int, priority: int = PRIORITY_SINGLE):
+        state = self._get_user(user_id)
+        if (
+            not self.backlog and
+            state.active < self.max_per_user and
+            self.active_global < self.max_global
+        ):
+            state.active += 1
+            self.active_global += 1
+            self.stats['granted'] += 1
+            return
+
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), priority)
+        state.waiters[priority].append(waiter)
+        self.backlog.setdefault(user_id, state)
+        self.stats['queued'] += 1
+        self._dispatch()
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                self.release(user_id)
+            else:
+                self._remove_waiter(state, waiter)
+                self._evict_if_idle(state)
+                self._dispatch()
+            raise
 
     def release(self, user_id: int):
-        user_sem = self._get_user_semaphore(user_id)
-        user_sem.release()
-        self.global_semaphore.release()
+        state = self.users.get(user_id)
+        if state and state.active > 0:
+            state.active -= 1
+            self.active_global -= 1
+            self._evict_if_idle(state)
+        self._dispatch()
+
+    def would_wait(self, user_id: int) -> bool:
+        state = self.users.get(user_id)
+        active = state.active if state else 0
+        return (
+            active >= self.max_per_user or
+            self.active_global >= self.max_global or
+            any(state.active < self.max_per_user for state in self.backlog.values())
+        )
+
+    def queue_position(self, user_id: int, priority: int = PRIORITY_SINGLE) -> int:
+        if not self.would_wait(user_id):
+            return 0
+        ahead = sum(
+            1
+            for state in self.backlog.values()
+            for waiter_priority, queue in state.waiters.items()
+            if waiter_priority <= priority
+            for waiter in queue
+            if not waiter.future.done() and (state.user_id == user_id or waiter_priority < priority)
+        )
+        competing_users = sum(
+            1 for state in self.backlog.values()
+            if state.user_id != user_id and any(
+                waiter_priority == priority and any(not waiter.future.done() for waiter in queue)
+                for waiter_priority, queue in state.waiters.items()
+            )
+        )
+        return ahead + competing_users + 1
+
+    def get_stats(self) -> dict:
+        return {
+            **self.stats,
+            'active': self.active_global,
+            'waiting': sum(state.pending() for state in self.backlog.values()),
+            'users': len(self.users),
+            'backlogged_users': len(self.backlog),
+        }
+
+    async def acquire_upload(self):
+        await self.upload_semaphore.acquire()
+
+    def release_upload(self):
+        self.upload_semaphore.release()
@@ -33,9 +33,11 @@ class WhitelistMiddleware:
     def check_admin(self, user_id: int) -> bool:
         return user_id in self.admin_users
 
-    async def check_user_async(self, user_id: int) -> bool:
+    async def check_user_async(self, user_id: int, profile=None) -> bool:
         if self.check_user(user_id):
             return True
+        if profile is not None:
+            return profile.is_whitelisted
         if self.cache:
             return await self.cache.is_user_whitelisted(user_id)
         return False
@@ -43,14 +45,15 @@ class WhitelistMiddleware:
     async def __call__(
         self,
         update: Update,
-        context: ContextTypes.DEFAULT_TYPE
+        context: ContextTypes.DEFAULT_TYPE,
+        profile=None
     ) -> bool:
         if not update.effective_user:
             return False
 
         user_id = update.effective_user.id
 
-        if not await self.check_user_async(user_id):
+        if not await self.check_user_async(user_id, profile):
             log_user_action(update, "access_denied")
             if update.message:
                 await update.message.reply_text(
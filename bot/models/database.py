@@ -1,22 +1,53 @@
+import asyncio
 import aiosqlite
+from contextlib import asynccontextmanager
 from pathlib import Path
 from typing import Optional
 
 
+CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 5000",
+)
+
+
 class Database:
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, read_connections: int = 4):
         self.db_path = db_path
+        self.read_connections = read_connections
         self.db: Optional[aiosqlite.Connection] = None
+        self.readers: list[aiosqlite.Connection] = []
+        self.reader_pool: asyncio.Queue[aiosqlite.Connection] = asyncio.Queue()
+        self.write_lock = asyncio.Lock()
 
     async def initialize(self):
         Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
 
         self.db = await aiosqlite.connect(self.db_path)
         self.db.row_factory = aiosqlite.Row
+        await self.db.execute("PRAGMA journal_mode = WAL")
+        await self._apply_pragmas(self.db)
 
         await self._create_tables()
         await self._migrate_tables()
 
+        for _ in range(self.read_connections):
+            reader = await aiosqlite.connect(
+                f"{Path(self.db_path).resolve().as_uri()}?mode=ro",
+                uri=True
+            )
+            reader.row_factory = aiosqlite.Row
+            await self._apply_pragmas(reader)
+            self.readers.append(reader)
+            self.reader_pool.put_nowait(reader)
+
+    async def _apply_pragmas(self, connection: aiosqlite.Connection):
+        for pragma in CONNECTION_PRAGMAS:
+            await connection.execute(pragma)
+
     async def _create_tables(self):
         await self.db.execute("""
             CREATE TABLE IF NOT EXISTS songs (
@@ -60,12 +91,43 @@ class Database:
             CREATE INDEX IF NOT EXISTS idx_whitelisted ON users(is_whitelisted)
         """)
 
+        await self.db.execute("""
+            CREATE TABLE IF NOT EXISTS song_codec_aliases (
+                apple_music_id TEXT NOT NULL,
+                requested_codec TEXT NOT NULL,
+                delivered_codec TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (apple_music_id, requested_codec)
+            )
+        """)
+
+        await self.db.execute("""
+            CREATE TABLE IF NOT EXISTS codec_availability (
+                apple_music_id TEXT NOT NULL,
+                codec TEXT NOT NULL,
+                available BOOLEAN NOT NULL,
+                last_checked TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (apple_music_id, codec)
+            )
+        """)
+
+        await self.db.execute("""
+            CREATE TABLE IF NOT EXISTS collections (
+                collection_id TEXT NOT NULL,
+                storefront TEXT NOT NULL,
+                track_ids TEXT NOT NULL,
+                fetched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (collection_id, storefront)
+            )
+        """)
+
         await self.db.commit()
 
     async def _migrate_tables(self):
         await self._migrate_songs_codec_cache()
         await self._ensure_column("users", "download_codec", "TEXT")
         await self._ensure_column("users", "send_lyrics", "BOOLEAN DEFAULT 0")
+        await self._ensure_column("songs", "delivered_codec", "TEXT")
         await self.db.execute("""
             CREATE INDEX IF NOT EXISTS idx_songs_codec ON songs(codec)
         """)
@@ -145,20 +207,57 @@ class Database:
             CREATE INDEX IF NOT EXISTS idx_songs_codec ON songs(codec)
         """)
 
+    @asynccontextmanager
+    async def reader(self):
+        if not self.readers:
+            yield self.db
+            return
+
+        connection = await self.reader_pool.get()
+        try:
+            yield connection
+        finally:
+            self.reader_pool.put_nowait(connection)
+
+    @asynccontextmanager
+    async def transaction(self):
+        async with self.write_lock:
+            if self.db.in_transaction:
+                await self.db.rollback()
+            try:
+                await self.db.execute("BEGIN IMMEDIATE")
+                yield self.db
+                await self.db.commit()
+            except BaseException:
+                if self.db.in_transaction:
+                    await asyncio.shield(self.db.rollback())
+                raise
+
     async def fetch_one(self, query: str, params: tuple = ()):
-        async with self.db.execute(query, params) as cursor:
-            row = await cursor.fetchone()
-            return dict(row) if row else None
+        async with self.reader() as connection:
+            async with connection.execute(query, params) as cursor:
+                row = await cursor.fetchone()
+                return dict(row) if row else None
 
     async def fetch_all(self, query: str, params: tuple = ()):
-        async with self.db.execute(query, params) as cursor:
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
+        async with self.reader() as connection:
+            async with connection.execute(query, params) as cursor:
+                rows = await cursor.fetchall()
+                return [dict(row) for row in rows]
 
     async def execute(self, query: str, params: tuple = ()):
-        await self.db.execute(query, params)
-        await self.db.commit()
+        async with self.transaction() as connection:
+            await connection.execute(query, params)
+
+    async def execute_many(self, query: str, params_list: list[tuple]):
+        if not params_list:
+            return
+        async with self.transaction() as connection:
+            await connection.executemany(query, params_list)
 
     async def close(self):
+        for reader in self.readers:
+            await reader.close()
+        self.readers = []
         if self.db:
             await self.db.close()
@@ -1,66 +1,465 @@
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
 from typing import Optional
 from ..models.database import Database
 
 
+logger = logging.getLogger(__name__)
+
+SQLITE_MAX_IN_PARAMS = 500
+USER_PROFILE_CACHE_MAX = 4096
+
+STORE_SONG_QUERY = """
+INSERT INTO songs (
+    apple_music_id, codec, delivered_codec, url, title, artist, album,
+    duration_ms, cover_url, file_id, file_unique_id, file_size, last_accessed
+)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(apple_music_id, codec) DO UPDATE SET
+    delivered_codec = excluded.delivered_codec,
+    file_id = excluded.file_id,
+    file_unique_id = excluded.file_unique_id,
+    file_size = excluded.file_size,
+    last_accessed = excluded.last_accessed
+"""
+CODEC_ALIAS_QUERY = """
+INSERT INTO song_codec_aliases (apple_music_id, requested_codec, delivered_codec, created_at)
+VALUES (?, ?, ?, ?)
+ON CONFLICT(apple_music_id, requested_codec) DO UPDATE SET
+    delivered_codec = excluded.delivered_codec,
+    created_at = excluded.created_at
+"""
+DELETE_CODEC_ALIAS_QUERY = """
+DELETE FROM song_codec_aliases WHERE apple_music_id = ? AND requested_codec = ?
+"""
+CODEC_AVAILABILITY_QUERY = """
+INSERT INTO codec_availability (apple_music_id, codec, available, last_checked)
+VALUES (?, ?, ?, ?)
+ON CONFLICT(apple_music_id, codec) DO UPDATE SET
+    available = excluded.available,
+    last_checked = excluded.last_checked
+"""
+RESOLVED_SONG_QUERY = """
+SELECT s.*, a.created_at AS alias_created_at FROM songs s
+LEFT JOIN song_codec_aliases a
+    ON a.apple_music_id = s.apple_music_id AND a.requested_codec = ? AND a.created_at >= ?
+WHERE s.apple_music_id = ? AND s.codec = COALESCE(a.delivered_codec, ?)
+"""
+USER_ACTIVITY_QUERY = """
+INSERT INTO users (user_id, username, first_name, last_activity, download_count)
+VALUES (?, ?, ?, ?, ?)
+ON CONFLICT(user_id) DO UPDATE SET
+    username = excluded.username,
+    first_name = excluded.first_name,
+    last_activity = excluded.last_activity,
+    download_count = download_count + excluded.download_count
+"""
+SONG_ACCESS_QUERY = """
+UPDATE songs SET access_count = access_count + ?, last_accessed = ?
+WHERE apple_music_id = ? AND codec = COALESCE(
+    (
+        SELECT delivered_codec FROM song_codec_aliases
+        WHERE apple_music_id = ? AND requested_codec = ? AND created_at >= ?
+    ),
+    ?
+)
+"""
+
+
+def _sqlite_timestamp(timestamp: Optional[float] = None) -> str:
+    moment = datetime.fromtimestamp(timestamp, timezone.utc) if timestamp is not None else datetime.now(timezone.utc)
+    return moment.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _parse_sqlite_timestamp(value: str) -> float:
+    return datetime.strptime(value, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc).timestamp()
+
+
+@dataclass
+class UserProfile:
+    user_id: int
+    is_whitelisted: bool = False
+    download_codec: Optional[str] = None
+    send_lyrics: bool = False
+
+
 class CacheService:
-    def __init__(self, db: Database):
+    def __init__(
+        self,
+        db: Database,
+        song_cache_size: int = 2048,
+        flush_interval_seconds: float = 5,
+        write_batch_size: int = 200,
+        user_profile_ttl_seconds: int = 300,
+        codec_availability_ttl_seconds: int = 604800,
+        collection_ttl_seconds: int = 86400
+    ):
         self.db = db
+        self.song_cache_size = song_cache_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self.write_batch_size = write_batch_size
+        self.user_profile_ttl_seconds = user_profile_ttl_seconds
+        self.codec_availability_ttl_seconds = codec_availability_ttl_seconds
+        self.collection_ttl_seconds = collection_ttl_seconds
+        self.hot_songs: OrderedDict[tuple[str, str], dict] = OrderedDict()
+        self.user_profiles: dict[int, tuple[float, UserProfile]] = {}
+        self.codec_availability: OrderedDict[str, dict[str, tuple[bool, float]]] = OrderedDict()
+        self.pending_access: dict[tuple[str, str], tuple[int, str]] = {}
+        self.pending_songs: dict[tuple[str, str], dict] = {}
+        self.pending_aliases: dict[tuple[str, str], str] = {}
+        self.inflight_songs: dict[tuple[str, str], dict] = {}
+        self.inflight_aliases: dict[tuple[str, str], str] = {}
+        self.pending_activity: dict[int, tuple[int, Optional[str], Optional[str], str]] = {}
+        self.pending_availability: dict[tuple[str, str], tuple[bool, str]] = {}
+        self.flush_lock = asyncio.Lock()
+        self.flush_event = asyncio.Event()
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'flushes': 0,
+            'flushed_writes': 0,
+            'availability_hits': 0,
+            'availability_misses': 0,
+        }
+
+    def _remember_song(self, key: tuple[str, str], song: dict):
+        if self.song_cache_size <= 0:
+            return
+        self.hot_songs[key] = song
+        self.hot_songs.move_to_end(key)
+        while len(self.hot_songs) > self.song_cache_size:
+            self.hot_songs.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def _alias_cutoff(self) -> str:
+        return _sqlite_timestamp(time.time() - self.codec_availability_ttl_seconds)
+
+    def _lookup_memory(self, key: tuple[str, str]) -> Optional[dict]:
+        delivered_codec = self.pending_aliases.get(key) or self.inflight_aliases.get(key, key[1])
+        song_key = (key[0], delivered_codec)
+        song = self.pending_songs.get(song_key) or self.inflight_songs.get(song_key)
+        if song:
+            return song
+        song = self.hot_songs.get(key)
+        if song and song['codec'] != key[1] and (song.get('alias_created_at') or '') < self._alias_cutoff():
+            self.hot_songs.pop(key, None)
+            return None
+        if song:
+            self.hot_songs.move_to_end(key)
+        return song
+
+    def _record_access(self, key: tuple[str, str]):
+        count, _ = self.pending_access.get(key, (0, None))
+        self.pending_access[key] = (count + 1, _sqlite_timestamp())
+        self._check_write_batch()
+
+    def _pending_write_count(self) -> int:
+        return (
+            len(self.pending_access) + len(self.pending_songs) + len(self.pending_aliases) +
+            len(self.pending_activity) + len(self.pending_availability)
+        )
+
+    def _check_write_batch(self):
+        if self._pending_write_count() >= self.write_batch_size:
+            self.flush_event.set()
+
+    def get_stats(self) -> dict:
+        lookups = self.stats['hits'] + self.stats['misses']
+        return {
+            **self.stats,
+            'size': len(self.hot_songs),
+            'capacity': self.song_cache_size,
+            'pending_access': len(self.pending_access),
+            'pending_songs': len(self.pending_songs),
+            'pending_activity': len(self.pending_activity),
+            'pending_availability': len(self.pending_availability),
+            'hit_rate': self.stats['hits'] / lookups if lookups else 0.0,
+        }
 
     async def get_cached_song(self, apple_music_id: str, codec: str) -> Optional[dict]:
-        query = "SELECT * FROM songs WHERE apple_music_id = ? AND codec = ?"
-        result = await self.db.fetch_one(query, (apple_music_id, codec))
+        key = (apple_music_id, codec)
+        song = self._lookup_memory(key)
+        if song:
+            self.stats['hits'] += 1
+            self._record_access(key)
+            return dict(song)
+
+        self.stats['misses'] += 1
+        result = await self.db.fetch_one(
+            RESOLVED_SONG_QUERY,
+            (codec, self._alias_cutoff(), apple_music_id, codec)
+        )
 
         if result:
-            await self.db.execute(
-                "UPDATE songs SET access_count = access_count + 1, "
-                "last_accessed = CURRENT_TIMESTAMP WHERE id = ?",
-                (result['id'],)
-            )
+            self._remember_song(key, result)
+            self._record_access(key)
+            return dict(result)
 
         return result
 
+    async def get_cached_songs(self, apple_music_ids: list[str], codec: str) -> dict[str, dict]:
+        found = {}
+        missing = []
+        for apple_music_id in dict.fromkeys(apple_music_ids):
+            key = (apple_music_id, codec)
+            song = self._lookup_memory(key)
+            if song:
+                self.stats['hits'] += 1
+                self._record_access(key)
+                found[apple_music_id] = dict(song)
+            else:
+                missing.append(apple_music_id)
+
+        self.stats['misses'] += len(missing)
+
+        for start in range(0, len(missing), SQLITE_MAX_IN_PARAMS):
+            chunk = missing[start:start + SQLITE_MAX_IN_PARAMS]
+            placeholders = ", ".join("?" for _ in chunk)
+            rows = await self.db.fetch_all(
+                f"""
+                SELECT s.*, a.created_at AS alias_created_at FROM songs s
+                LEFT JOIN song_codec_aliases a
+                    ON a.apple_music_id = s.apple_music_id AND a.requested_codec = ? AND a.created_at >= ?
+                WHERE s.apple_music_id IN ({placeholders})
+                    AND s.codec = COALESCE(a.delivered_codec, ?)
+                """,
+                (codec, self._alias_cutoff(), *chunk, codec)
+            )
+            for row in rows:
+                key = (row['apple_music_id'], codec)
+                self._remember_song(key, row)
+                self._record_access(key)
+                found[row['apple_music_id']] = dict(row)
+
+        return found
+
+    async def get_codec_availability(self, apple_music_id: str) -> dict[str, bool]:
+        entries = self.codec_availability.get(apple_music_id)
+        if entries is None:
+            self.stats['availability_misses'] += 1
+            rows = await self.db.fetch_all(
+                "SELECT codec, available, last_checked FROM codec_availability WHERE apple_music_id = ?",
+                (apple_music_id,)
+            )
+            entries = {
+                row['codec']: (bool(row['available']), _parse_sqlite_timestamp(row['last_checked']))
+                for row in rows
+            }
+            for (pending_id, codec), (available, checked_at) in self.pending_availability.items():
+                if pending_id == apple_music_id:
+                    entries[codec] = (available, _parse_sqlite_timestamp(checked_at))
+            self.codec_availability[apple_music_id] = entries
+            while len(self.codec_availability) > max(self.song_cache_size, 1):
+                self.codec_availability.popitem(last=False)
+        else:
+            self.stats['availability_hits'] += 1
+            self.codec_availability.move_to_end(apple_music_id)
+
+        cutoff = time.time() - self.codec_availability_ttl_seconds
+        return {
+            codec: available for codec, (available, checked_at) in entries.items()
+            if checked_at >= cutoff
+        }
+
+    def set_codec_availability(self, apple_music_id: str, codec: str, available: bool):
+        entries = self.codec_availability.get(apple_music_id)
+        if entries is not None:
+            entries[codec] = (available, time.time())
+        self.pending_availability[(apple_music_id, codec)] = (available, _sqlite_timestamp())
+        self._check_write_batch()
+
+    def _restore_pending(self, songs: dict, aliases: dict, activity: dict, access: dict, availability: dict):
+        for key, song in songs.items():
+            self.pending_songs.setdefault(key, song)
+        for key, delivered_codec in aliases.items():
+            self.pending_aliases.setdefault(key, delivered_codec)
+        for user_id, (count, username, first_name, active_at) in activity.items():
+            if user_id in self.pending_activity:
+                current, username, first_name, active_at = self.pending_activity[user_id]
+                count += current
+            self.pending_activity[user_id] = (count, username, first_name, active_at)
+        for key, (count, accessed_at) in access.items():
+            current, latest = self.pending_access.get(key, (0, accessed_at))
+            self.pending_access[key] = (current + count, max(latest, accessed_at))
+        for key, status in availability.items():
+            self.pending_availability.setdefault(key, status)
+
+    async def flush_writes(self):
+        async with self.flush_lock:
+            if not self._pending_write_count():
+                return
+            songs, self.pending_songs = self.pending_songs, {}
+            aliases, self.pending_aliases = self.pending_aliases, {}
+            activity, self.pending_activity = self.pending_activity, {}
+            access, self.pending_access = self.pending_access, {}
+            availability, self.pending_availability = self.pending_availability, {}
+            self.inflight_songs, self.inflight_aliases = songs, aliases
+            aliased_at = _sqlite_timestamp()
+            try:
+                async with self.db.transaction() as connection:
+                    if songs:
+                        await connection.executemany(STORE_SONG_QUERY, [
+                            (
+                                song['apple_music_id'], song['codec'], song['delivered_codec'],
+                                song['url'], song['title'], song['artist'], song['album'],
+                                song['duration_ms'], song['cover_url'], song['file_id'],
+                                song['file_unique_id'], song['file_size'], song['last_accessed']
+                            )
+                            for song in songs.values()
+                        ])
+                    if aliases:
+                        await connection.executemany(CODEC_ALIAS_QUERY, [
+                            (apple_music_id, requested_codec, delivered_codec, aliased_at)
+                            for (apple_music_id, requested_codec), delivered_codec in aliases.items()
+                            if requested_codec != delivered_codec
+                        ])
+                        await connection.executemany(DELETE_CODEC_ALIAS_QUERY, [
+                            (apple_music_id, requested_codec)
+                            for (apple_music_id, requested_codec), delivered_codec in aliases.items()
+                            if requested_codec == delivered_codec
+                        ])
+                    if activity:
+                        await connection.executemany(USER_ACTIVITY_QUERY, [
+                            (user_id, username, first_name, active_at, count)
+                            for user_id, (count, username, first_name, active_at) in activity.items()
+                        ])
+                    if access:
+                        alias_cutoff = self._alias_cutoff()
+                        await connection.executemany(SONG_ACCESS_QUERY, [
+                            (count, accessed_at, apple_music_id, apple_music_id, codec, alias_cutoff, codec)
+                            for (apple_music_id, codec), (count, accessed_at) in access.items()
+                        ])
+                    if availability:
+                        await connection.executemany(CODEC_AVAILABILITY_QUERY, [
+                            (apple_music_id, codec, int(available), checked_at)
+                            for (apple_music_id, codec), (available, checked_at) in availability.items()
+                        ])
+            except BaseException:
+                self._restore_pending(songs, aliases, activity, access, availability)
+                raise
+            finally:
+                self.inflight_songs, self.inflight_aliases = {}, {}
+
+            for key, song in songs.items():
+                if key not in self.pending_songs:
+                    self._remember_song(key, song)
+            for key, delivered_codec in aliases.items():
+                song = songs.get((key[0], delivered_codec))
+                if song and key not in self.pending_aliases:
+                    self._remember_song(key, {**song, 'alias_created_at': aliased_at})
+            written = len(songs) + len(aliases) + len(activity) + len(access) + len(availability)
+            self.stats['flushes'] += 1
+            self.stats['flushed_writes'] += written
+            logger.debug(
+                f"Flushed {written} cache writes: {len(songs)} songs, "
+                f"{len(activity)} users, {len(access)} access counters, "
+                f"{len(availability)} codec checks"
+            )
+
+    async def flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.flush_event.wait(), timeout=self.flush_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self.flush_event.clear()
+            try:
+                await self.flush_writes()
+            except Exception as e:
+                logger.warning(f"Failed to flush cache writes: {e}")
+
+    async def flush(self):
+        await self.flush_writes()
+
     async def store_song(
         self,
         metadata: dict,
         codec: str,
         file_id: str,
         file_unique_id: str,
-        file_size: int
+        file_size: int,
+        delivered_codec: Optional[str] = None
     ):
-        query = """
-        INSERT INTO songs (
-            apple_music_id, codec, url, title, artist, album,
-            duration_ms, cover_url, file_id, file_unique_id, file_size
+        delivered_codec = delivered_codec or codec
+        key = (metadata['apple_music_id'], delivered_codec)
+        self.hot_songs.pop(key, None)
+        self.hot_songs.pop((metadata['apple_music_id'], codec), None)
+        self.pending_aliases[(metadata['apple_music_id'], codec)] = delivered_codec
+        self.pending_songs[key] = {
+            'id': None,
+            'apple_music_id': metadata['apple_music_id'],
+            'codec': delivered_codec,
+            'delivered_codec': delivered_codec,
+            'url': metadata['url'],
+            'title': metadata['title'],
+            'artist': metadata['artist'],
+            'album': metadata['album'],
+            'duration_ms': metadata['duration_ms'],
+            'cover_url': metadata['cover_url'],
+            'file_id': file_id,
+            'file_unique_id': file_unique_id,
+            'file_size': file_size,
+            'last_accessed': _sqlite_timestamp(),
+            'access_count': 0,
+        }
+        self._check_write_batch()
+
+    async def get_collection_tracks(self, collection_id: str, storefront: str) -> Optional[list[str]]:
+        row = await self.db.fetch_one(
+            "SELECT track_ids FROM collections "
+            "WHERE collection_id = ? AND storefront = ? AND fetched_at >= datetime('now', ?)",
+            (collection_id, storefront, f"-{self.collection_ttl_seconds} seconds")
         )
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ON CONFLICT(apple_music_id, codec) DO UPDATE SET
-            file_id = excluded.file_id,
-            file_unique_id = excluded.file_unique_id,
-            file_size = excluded.file_size,
-            last_accessed = CURRENT_TIMESTAMP
-        """
+        return json.loads(row['track_ids']) if row else None
 
-        await self.db.execute(query, (
-            metadata['apple_music_id'],
-            codec,
-            metadata['url'],
-            metadata['title'],
-            metadata['artist'],
-            metadata['album'],
-            metadata['duration_ms'],
-            metadata['cover_url'],
-            file_id,
-            file_unique_id,
-            file_size
-        ))
+    async def store_collection(self, collection_id: str, storefront: str, track_ids: list[str]):
+        query = """
+        INSERT INTO collections (collection_id, storefront, track_ids, fetched_at)
+        VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(collection_id, storefront) DO UPDATE SET
+            track_ids = excluded.track_ids,
+            fetched_at = excluded.fetched_at
+        """
+        await self.db.execute(query, (collection_id, storefront, json.dumps(track_ids)))
 
     async def get_user(self, user_id: int) -> Optional[dict]:
         query = "SELECT * FROM users WHERE user_id = ?"
         return await self.db.fetch_one(query, (user_id,))
 
-    async def is_user_whitelisted(self, user_id: int) -> bool:
+    async def get_user_profile(self, user_id: int) -> UserProfile:
+        now = time.monotonic()
+        entry = self.user_profiles.get(user_id)
+        if entry and entry[0] > now:
+            return entry[1]
+
         user = await self.get_user(user_id)
-        return bool(user and user.get('is_whitelisted'))
+        profile = UserProfile(
+            user_id=user_id,
+            is_whitelisted=bool(user and user.get('is_whitelisted')),
+            download_codec=user.get('download_codec') if user else None,
+            send_lyrics=bool(user and user.get('send_lyrics'))
+        )
+
+        if len(self.user_profiles) >= USER_PROFILE_CACHE_MAX:
+            self.user_profiles = {
+                cached_id: cached for cached_id, cached in self.user_profiles.items()
+                if cached[0] > now
+            }
+        self.user_profiles[user_id] = (now + self.user_profile_ttl_seconds, profile)
+        return profile
+
+    def invalidate_user_profile(self, user_id: int):
+        self.user_profiles.pop(user_id, None)
+
+    async def is_user_whitelisted(self, user_id: int) -> bool:
+        profile = await self.get_user_profile(user_id)
+        return profile.is_whitelisted
 
     async def list_whitelisted_users(self) -> list[dict]:
         query = """
@@ -87,16 +486,15 @@ class CacheService:
             is_whitelisted = excluded.is_whitelisted
         """
         await self.db.execute(query, (user_id, username, first_name, int(is_whitelisted)))
+        self.invalidate_user_profile(user_id)
 
     async def get_user_codec(self, user_id: int, default_codec: str) -> str:
-        user = await self.get_user(user_id)
-        if user and user.get('download_codec'):
-            return user['download_codec']
-        return default_codec
+        profile = await self.get_user_profile(user_id)
+        return profile.download_codec or default_codec
 
     async def get_user_send_lyrics(self, user_id: int) -> bool:
-        user = await self.get_user(user_id)
-        return bool(user and user.get('send_lyrics'))
+        profile = await self.get_user_profile(user_id)
+        return profile.send_lyrics
 
     async def set_user_send_lyrics(
         self,
@@ -114,6 +512,7 @@ class CacheService:
             send_lyrics = excluded.send_lyrics
         """
         await self.db.execute(query, (user_id, username, first_name, int(send_lyrics)))
+        self.invalidate_user_profile(user_id)
 
     async def set_user_codec(
         self,
@@ -131,15 +530,9 @@ class CacheService:
             download_codec = excluded.download_codec
         """
         await self.db.execute(query, (user_id, username, first_name, codec))
+        self.invalidate_user_profile(user_id)
 
     async def update_user_activity(self, user_id: int, username: str = None, first_name: str = None):
-        query = """
-        INSERT INTO users (user_id, username, first_name, last_activity, download_count)
-        VALUES (?, ?, ?, CURRENT_TIMESTAMP, 1)
-        ON CONFLICT(user_id) DO UPDATE SET
-            username = excluded.username,
-            first_name = excluded.first_name,
-            last_activity = CURRENT_TIMESTAMP,
-            download_count = download_count + 1
-        """
-        await self.db.execute(query, (user_id, username, first_name))
+        count = self.pending_activity.get(user_id, (0,))[0]
+        self.pending_activity[user_id] = (count + 1, username, first_name, _sqlite_timestamp())
+        self._check_write_batch()
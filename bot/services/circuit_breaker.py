@@ -0,0 +1,73 @@
+import time
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout: float = 60):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.stats = {
+            'opened': 0,
+            'half_opened': 0,
+            'closed': 0,
+            'failures': 0,
+            'successes': 0,
+        }
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self.stats['half_opened'] += 1
+            logger.info(f"Circuit '{self.name}' half-open, allowing trial requests")
+        return self._state
+
+    def allow_request(self) -> bool:
+        state = self.state
+        return state == CLOSED or (state == HALF_OPEN and not self.trial_in_flight)
+
+    def acquire(self) -> bool:
+        if not self.allow_request():
+            return False
+        if self._state == HALF_OPEN:
+            self.trial_in_flight = True
+        return True
+
+    def release(self):
+        self.trial_in_flight = False
+
+    def record_success(self):
+        self.stats['successes'] += 1
+        self.failures = 0
+        self.trial_in_flight = False
+        if self._state != CLOSED:
+            self._state = CLOSED
+            self.stats['closed'] += 1
+            logger.info(f"Circuit '{self.name}' closed")
+
+    def record_failure(self):
+        self.stats['failures'] += 1
+        self.failures += 1
+        self.trial_in_flight = False
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.trip()
+
+    def trip(self):
+        if self._state != OPEN:
+            self.stats['opened'] += 1
+            logger.warning(f"Circuit '{self.name}' open after {self.failures} failure(s)")
+        self._state = OPEN
+        self.opened_at = time.monotonic()
+        self.trial_in_flight = False
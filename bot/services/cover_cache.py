@@ -0,0 +1,146 @@
+import asyncio
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+class CoverCache:
+    def __init__(self, directory: str, memory_items: int = 256, disk_max_bytes: int = 200 * 1024 * 1024):
+        self.directory = Path(directory)
+        self.memory_items = memory_items
+        self.disk_max_bytes = disk_max_bytes
+        self.memory: OrderedDict[str, bytes] = OrderedDict()
+        self.disk: OrderedDict[str, int] = OrderedDict()
+        self.disk_bytes = 0
+        self.inflight: dict[str, asyncio.Future] = {}
+        self.stats = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'coalesced': 0,
+            'evictions': 0,
+        }
+
+    def initialize(self):
+        if self.disk_max_bytes <= 0:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        entries = []
+        for path in self.directory.glob("*.jpg"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, path.name, stat.st_size))
+        for _, name, size in sorted(entries):
+            self.disk[name] = size
+            self.disk_bytes += size
+        self._evict_disk()
+        logger.info(f"Cover cache loaded {len(self.disk)} covers ({self.disk_bytes / 1024 / 1024:.1f} MB) from {self.directory}")
+
+    def _filename(self, key: str) -> str:
+        return f"{hashlib.sha1(key.encode('utf8')).hexdigest()}.jpg"
+
+    def _remember(self, key: str, data: bytes):
+        if self.memory_items <= 0:
+            return
+        self.memory[key] = data
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_items:
+            self.memory.popitem(last=False)
+
+    def _evict_disk(self):
+        while self.disk_bytes > self.disk_max_bytes and self.disk:
+            name, size = self.disk.popitem(last=False)
+            self.disk_bytes -= size
+            self.stats['evictions'] += 1
+            try:
+                (self.directory / name).unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Failed to evict cover {name}: {e}")
+
+    def _read_disk(self, name: str) -> Optional[bytes]:
+        path = self.directory / name
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+            return data
+        except OSError:
+            return None
+
+    def _write_disk(self, name: str, data: bytes):
+        path = self.directory / name
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+    async def _load(self, key: str, fetch: Callable[[], Awaitable[Optional[bytes]]]) -> Optional[bytes]:
+        name = self._filename(key)
+        if name in self.disk:
+            data = await asyncio.to_thread(self._read_disk, name)
+            if data:
+                self.disk.move_to_end(name)
+                self.stats['disk_hits'] += 1
+                self._remember(key, data)
+                return data
+            self.disk_bytes -= self.disk.pop(name)
+
+        self.stats['misses'] += 1
+        data = await fetch()
+        if not data:
+            return None
+
+        self._remember(key, data)
+        if 0 < len(data) <= self.disk_max_bytes:
+            try:
+                await asyncio.to_thread(self._write_disk, name, data)
+                self.disk_bytes += len(data) - self.disk.pop(name, 0)
+                self.disk[name] = len(data)
+                self._evict_disk()
+            except OSError as e:
+                logger.warning(f"Failed to persist cover for {key}: {e}")
+        return data
+
+    async def get_or_fetch(self, key: str, fetch: Callable[[], Awaitable[Optional[bytes]]]) -> Optional[bytes]:
+        data = self.memory.get(key)
+        if data:
+            self.memory.move_to_end(key)
+            self.stats['memory_hits'] += 1
+            return data
+
+        future = self.inflight.get(key)
+        if future:
+            self.stats['coalesced'] += 1
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[key] = future
+        try:
+            data = await self._load(key, fetch)
+            future.set_result(data)
+            return data
+        except asyncio.CancelledError:
+            future.set_result(None)
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            self.inflight.pop(key, None)
+
+    def get_stats(self) -> dict:
+        return {
+            **self.stats,
+            'memory_size': len(self.memory),
+            'disk_size': len(self.disk),
+            'disk_mb': round(self.disk_bytes / 1024 / 1024, 1),
+        }
@@ -1,8 +1,14 @@
 import re
 import sys
+import copy
+import json
+import time
+import base64
 import logging
-import socket
 import asyncio
+import traceback
+from collections import OrderedDict
+from dataclasses import dataclass, field
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent.parent / "gamdl"))
@@ -12,10 +18,80 @@ logger = logging.getLogger(__name__)
 from gamdl.api.apple_music_api import AppleMusicApi
 
 _APPLE_MUSIC_URL = "https://music.apple.com"
+TOKEN_REFRESH_MARGIN_SECONDS = 3600
+TOKEN_DEFAULT_LIFETIME_SECONDS = 43200
+
+
+def _decode_token_expiry(token: str) -> float | None:
+    try:
+        payload = token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload))['exp'])
+    except Exception:
+        return None
+
+
+class DeveloperTokenStore:
+    def __init__(self):
+        self.path: Path | None = None
+        self.token: str | None = None
+        self.expires_at = 0.0
+        self.lock = asyncio.Lock()
+
+    def configure(self, path: str | Path):
+        self.path = Path(path)
+        try:
+            data = json.loads(self.path.read_text())
+            self.token = data['token']
+            self.expires_at = float(data['exp'])
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable developer token cache {self.path}: {e}")
+            return
+        if self.is_fresh():
+            logger.info(f"Loaded cached developer token, refresh due in {self.seconds_until_refresh() / 3600:.1f}h")
+
+    def _save(self):
+        if not self.path:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.path.with_suffix('.tmp')
+            temp_path.write_text(json.dumps({'token': self.token, 'exp': self.expires_at}))
+            temp_path.replace(self.path)
+        except Exception as e:
+            logger.warning(f"Failed to persist developer token: {e}")
+
+    def seconds_until_refresh(self) -> float:
+        return self.expires_at - TOKEN_REFRESH_MARGIN_SECONDS - time.time()
+
+    def is_fresh(self) -> bool:
+        return bool(self.token) and self.seconds_until_refresh() > 0
+
+    async def get(self, client, force: bool = False, stale_token: str | None = None) -> str:
+        async with self.lock:
+            if self.token and force and stale_token and stale_token != self.token:
+                return self.token
+            if not force and self.is_fresh():
+                return self.token
+            token = await _scrape_developer_token(client)
+            self.token = token
+            self.expires_at = _decode_token_expiry(token) or time.time() + TOKEN_DEFAULT_LIFETIME_SECONDS
+            self._save()
+            logger.info("Fetched new Apple Music developer token")
+            return token
+
+
+developer_tokens = DeveloperTokenStore()
 
 
 async def _patched_get_token(self) -> str:
-    response = await self.client.get(_APPLE_MUSIC_URL)
+    return await developer_tokens.get(self.client)
+
+
+async def _scrape_developer_token(client) -> str:
+    response = await client.get(_APPLE_MUSIC_URL)
     home_page = response.text
 
     index_js_uri_match = re.search(r"/(assets/index[~-][^/\"]+\.js)", home_page)
@@ -23,7 +99,7 @@ async def _patched_get_token(self) -> str:
         raise Exception("index.js URI not found in Apple Music homepage")
     index_js_uri = index_js_uri_match.group(1)
 
-    response = await self.client.get(f"{_APPLE_MUSIC_URL}/{index_js_uri}")
+    response = await client.get(f"{_APPLE_MUSIC_URL}/{index_js_uri}")
     index_js_page = response.text
 
     token_match = re.search(
@@ -36,6 +112,7 @@ async def _patched_get_token(self) -> str:
 
 
 AppleMusicApi._get_token = _patched_get_token
+from gamdl.api.exceptions import ApiError
 from gamdl.api.itunes_api import ItunesApi
 from gamdl.interface import AppleMusicInterface
 from gamdl.interface.interface_song import AppleMusicSongInterface
@@ -48,9 +125,20 @@ from gamdl.downloader.downloader_song import AppleMusicSongDownloader
 from gamdl.downloader.downloader_music_video import AppleMusicMusicVideoDownloader
 from gamdl.downloader.downloader_uploaded_video import AppleMusicUploadedVideoDownloader
 from gamdl.downloader.types import DownloadItem, UrlInfo
+from gamdl.downloader.constants import (
+    ALBUM_MEDIA_TYPE,
+    PLAYLIST_MEDIA_TYPE,
+    SONG_MEDIA_TYPE,
+    TEMP_PATH_TEMPLATE,
+)
 from gamdl.downloader.exceptions import FormatNotAvailable
+from gamdl.interface.constants import LEGACY_SONG_CODECS, SONG_CODEC_REGEX_MAP
+from gamdl.utils import get_response
+import m3u8
 
 from ..config import Config
+from .circuit_breaker import CLOSED, CircuitBreaker
+from .rate_limit import TokenBucket
 
 
 CODEC_MAP = {
@@ -67,6 +155,11 @@ CODEC_MAP = {
     "alac": SongCodec.ALAC
 }
 WRAPPER_REQUIRED_CODECS = {"atmos", "alac"}
+WRAPPER_DOWN_CODEC_MAP = {
+    "aac-he": "aac-he-legacy",
+    "aac-he-binaural": "aac-he-legacy",
+    "aac-he-downmix": "aac-he-legacy",
+}
 AAC_FALLBACK_CHAIN = {
     'aac': ['aac-legacy', 'aac-he-legacy'],
     'aac-he': ['aac', 'aac-legacy'],
@@ -93,16 +186,84 @@ RECOVERABLE_CODEC_ERROR_KEYWORDS = (
     "timed out",
     "timeout",
 )
+DOWNLOAD_QUEUE_CACHE_MAX = 256
+DOWNLOADER_CACHE_MAX = 8
+
+
+class CodecUnavailableError(Exception):
+    pass
+
+
+@dataclass
+class CodecPlan:
+    codec: str | None
+    reason: str | None = None
+    known: dict[str, bool] = field(default_factory=dict)
+    probed: bool = False
+
+
+@dataclass
+class AppleMusicAccount:
+    name: str
+    apple_music_api: AppleMusicApi
+    interface: AppleMusicInterface
+    limiter: TokenBucket
+    outstanding: int = 0
+    requests: int = 0
+    license_errors: int = 0
+    quarantined_until: float = 0.0
+
+
+@dataclass
+class WrapperEndpoint:
+    url: str
+    breaker: CircuitBreaker
+    outstanding: int = 0
+    completed: int = 0
 
 
 class DownloaderService:
-    def __init__(self, config: Config):
+    def __init__(self, config: Config, cache=None):
         self.config = config
+        self.cache = cache
         self.apple_music_api = None
         self.downloader = None
-        self.downloaders = {}
+        self.downloaders: OrderedDict[tuple[str, bool, str, str], AppleMusicDownloader] = OrderedDict()
+        self.accounts: list[AppleMusicAccount] = []
+        self.account_cursor = 0
         self.interface = None
         self.base_downloader = None
+        self.base_downloaders: dict[str, AppleMusicBaseDownloader] = {}
+        self.queue_inflight: dict[tuple, asyncio.Task] = {}
+        self.queue_results: dict[tuple, tuple[float, list[DownloadItem]]] = {}
+        self.wrapper_endpoints = [
+            WrapperEndpoint(
+                url,
+                CircuitBreaker(
+                    f"wrapper {url}",
+                    failure_threshold=config.wrapper_failure_threshold,
+                    reset_timeout=config.wrapper_reset_timeout_seconds
+                )
+            )
+            for url in config.wrapper_urls
+        ]
+        self.endpoint_cursor = 0
+        self.stats = {
+            'codec_skips': 0,
+            'downloaders_created': 0,
+            'downloaders_reused': 0,
+            'downloaders_evicted': 0,
+            'queue_fetches': 0,
+            'queue_coalesced': 0,
+            'queue_cache_hits': 0,
+            'codec_plans': 0,
+            'codec_plan_fallbacks': 0,
+            'codec_probes': 0,
+            'codec_probe_failures': 0,
+            'account_quarantines': 0,
+            'account_retries': 0,
+            'token_refreshes': 0,
+        }
 
     @property
     def supported_codecs(self) -> list[str]:
@@ -116,44 +277,185 @@ class DownloaderService:
         normalized = self.normalize_codec(codec)
         return self.config.use_wrapper or normalized not in WRAPPER_REQUIRED_CODECS
 
+    def is_wrapper_healthy(self) -> bool:
+        return not self.config.use_wrapper or any(
+            endpoint.breaker.allow_request() for endpoint in self.wrapper_endpoints
+        )
+
     def effective_codec(self, codec: str | None) -> str:
         normalized = self.normalize_codec(codec)
         if not self.is_codec_available(normalized):
             return "aac"
+        if normalized not in LEGACY_SONG_CODECS and not self.is_wrapper_healthy():
+            return WRAPPER_DOWN_CODEC_MAP.get(normalized, "aac-legacy")
         return normalized
 
+    def _is_wrapper_error(self, error: Exception, endpoint: WrapperEndpoint) -> bool:
+        if isinstance(error, (FormatNotAvailable, CodecUnavailableError)):
+            return False
+        if isinstance(error, asyncio.IncompleteReadError):
+            return True
+        host, _, port = endpoint.url.rpartition(':')
+        error_msg = str(error)
+        if isinstance(error, OSError) and host in error_msg and port in error_msg:
+            return True
+        return any(
+            'decrypt' in frame.name.lower()
+            for frame in traceback.extract_tb(error.__traceback__)
+        )
+
+    def _select_endpoint(self) -> WrapperEndpoint | None:
+        count = len(self.wrapper_endpoints)
+        start = self.endpoint_cursor % count
+        self.endpoint_cursor += 1
+        ordered = self.wrapper_endpoints[start:] + self.wrapper_endpoints[:start]
+        closed = [endpoint for endpoint in ordered if endpoint.breaker.state == CLOSED]
+        for endpoint in sorted(closed, key=lambda endpoint: endpoint.outstanding):
+            if endpoint.breaker.acquire():
+                return endpoint
+        for endpoint in ordered:
+            if endpoint.breaker.acquire():
+                return endpoint
+        return None
+
+    def _is_account_available(self, account: AppleMusicAccount) -> bool:
+        return account.quarantined_until <= time.monotonic()
+
+    def _select_account(self, exclude: set[str] | None = None) -> AppleMusicAccount:
+        exclude = exclude or set()
+        count = len(self.accounts)
+        start = self.account_cursor % count
+        self.account_cursor += 1
+        ordered = [
+            account for account in self.accounts[start:] + self.accounts[:start]
+            if account.name not in exclude
+        ] or self.accounts
+        candidates = [account for account in ordered if self._is_account_available(account)]
+        if not candidates:
+            return min(ordered, key=lambda account: account.quarantined_until)
+        return min(
+            candidates,
+            key=lambda account: (account.limiter.wait_time(), account.outstanding)
+        )
+
+    def _quarantine_account(self, account: AppleMusicAccount, error: Exception):
+        account.license_errors += 1
+        account.quarantined_until = time.monotonic() + self.config.account_quarantine_seconds
+        self.stats['account_quarantines'] += 1
+        logger.warning(
+            f"Quarantining Apple Music account {account.name} for "
+            f"{self.config.account_quarantine_seconds}s after license error: {error}"
+        )
+
+    def account_stats(self) -> dict[str, dict]:
+        now = time.monotonic()
+        return {
+            account.name: {
+                'outstanding': account.outstanding,
+                'requests': account.requests,
+                'license_errors': account.license_errors,
+                'quarantined_for': max(0, round(account.quarantined_until - now)),
+            }
+            for account in self.accounts
+        }
+
+    def wrapper_stats(self) -> dict[str, dict]:
+        return {
+            endpoint.url: {
+                'state': endpoint.breaker.state,
+                'outstanding': endpoint.outstanding,
+                'completed': endpoint.completed,
+                **endpoint.breaker.stats,
+            }
+            for endpoint in self.wrapper_endpoints
+        }
+
+    def _is_license_error(self, error: Exception) -> bool:
+        error_msg = str(error).lower()
+        return 'license exchange' in error_msg or 'status":-1002' in error_msg
+
+    def _license_error(self, track_artist: str, track_title: str) -> Exception:
+        return Exception(
+            f"DRM authentication failed for '{track_artist} - {track_title}'. "
+            "Please re-authenticate the wrapper service:\n"
+            "1. Stop wrapper: docker ps | grep wrapper && docker stop <container_id>\n"
+            "2. Clear auth: bash clear_wrapper_auth.sh\n"
+            "3. Restart wrapper and re-authenticate"
+        )
+
     def is_recoverable_codec_error(self, error: Exception) -> bool:
         error_msg = str(error).lower()
         return (
-            isinstance(error, (FormatNotAvailable, asyncio.IncompleteReadError)) or
+            isinstance(error, (FormatNotAvailable, CodecUnavailableError, asyncio.IncompleteReadError)) or
             any(keyword in error_msg for keyword in RECOVERABLE_CODEC_ERROR_KEYWORDS)
         )
 
-    def _check_wrapper_available(self, timeout: int = 2) -> bool:
+    async def _check_wrapper_available(self, url: str, timeout: float | None = None) -> bool:
+        timeout = timeout or self.config.wrapper_probe_timeout_seconds
         try:
-            host, port_str = self.config.wrapper_url.rsplit(':', 1)
-            port = int(port_str)
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(timeout)
-            result = sock.connect_ex((host, port))
-            sock.close()
-            return result == 0
+            host, port_str = url.rsplit(':', 1)
+            _, writer = await asyncio.wait_for(
+                asyncio.open_connection(host, int(port_str)),
+                timeout=timeout
+            )
+            writer.close()
+            await writer.wait_closed()
+            return True
         except Exception as e:
-            logger.debug(f"Wrapper check failed: {e}")
+            logger.debug(f"Wrapper check failed for {url}: {e}")
             return False
 
-    async def initialize(self):
+    async def probe_wrappers(self) -> dict[str, bool]:
+        results = await asyncio.gather(
+            *(self._check_wrapper_available(endpoint.url) for endpoint in self.wrapper_endpoints)
+        )
+        for endpoint, healthy in zip(self.wrapper_endpoints, results):
+            if healthy:
+                endpoint.breaker.record_success()
+            else:
+                endpoint.breaker.trip()
+        return {endpoint.url: healthy for endpoint, healthy in zip(self.wrapper_endpoints, results)}
+
+    def _is_token_error(self, error) -> bool:
+        return isinstance(error, ApiError) and error.status_code == 401
+
+    def _apply_developer_token(self, token: str):
+        for account in self.accounts:
+            account.apple_music_api.token = token
+            account.apple_music_api.client.headers.update({"authorization": f"Bearer {token}"})
+
+    async def refresh_developer_token(self, force: bool = False, stale_token: str | None = None) -> str:
+        previous_token = developer_tokens.token
+        token = await developer_tokens.get(
+            self.apple_music_api.client,
+            force=force,
+            stale_token=stale_token
+        )
+        if token != previous_token:
+            self.stats['token_refreshes'] += 1
+        self._apply_developer_token(token)
+        return token
+
+    async def token_refresh_loop(self):
+        while True:
+            await asyncio.sleep(max(60, developer_tokens.seconds_until_refresh()))
+            try:
+                await self.refresh_developer_token()
+            except Exception as e:
+                logger.warning(f"Developer token refresh failed: {e}")
+
+    async def _create_account(self, cookies_path: str) -> AppleMusicAccount:
         try:
-            self.apple_music_api = await AppleMusicApi.create_from_netscape_cookies(
-                cookies_path=self.config.cookies_path
+            apple_music_api = await AppleMusicApi.create_from_netscape_cookies(
+                cookies_path=cookies_path
             )
 
-            if not self.apple_music_api.active_subscription:
+            if not apple_music_api.active_subscription:
                 raise ValueError("Apple Music subscription is not active")
 
         except FileNotFoundError:
             raise FileNotFoundError(
-                f"Cookies file not found at {self.config.cookies_path}. "
+                f"Cookies file not found at {cookies_path}. "
                 "Please export cookies from Apple Music website."
             )
         except ValueError as e:
@@ -164,36 +466,78 @@ class DownloaderService:
                 )
             raise
 
-        self.interface = AppleMusicInterface(
-            self.apple_music_api,
+        interface = AppleMusicInterface(
+            apple_music_api,
             ItunesApi(
-                self.apple_music_api.storefront,
-                self.apple_music_api.language
+                apple_music_api.storefront,
+                apple_music_api.language
+            )
+        )
+        return AppleMusicAccount(
+            name=cookies_path,
+            apple_music_api=apple_music_api,
+            interface=interface,
+            limiter=TokenBucket(
+                self.config.account_requests_per_second,
+                self.config.account_burst
             )
         )
 
+    async def initialize(self):
+        developer_tokens.configure(Path(self.config.database_path).with_name("developer_token.json"))
+        account_error = None
+        for cookies_path in self.config.cookies_paths:
+            try:
+                account = await self._create_account(cookies_path)
+            except Exception as e:
+                logger.error(f"Failed to load Apple Music account from {cookies_path}: {e}")
+                account_error = e
+                continue
+            if self.accounts and account.apple_music_api.storefront != self.accounts[0].apple_music_api.storefront:
+                logger.warning(
+                    f"Apple Music account {cookies_path} uses storefront "
+                    f"{account.apple_music_api.storefront}, expected "
+                    f"{self.accounts[0].apple_music_api.storefront}; skipping it"
+                )
+                continue
+            self.accounts.append(account)
+
+        if not self.accounts:
+            raise account_error
+
+        self.apple_music_api = self.accounts[0].apple_music_api
+        self.interface = self.accounts[0].interface
+        logger.info(f"Loaded {len(self.accounts)} Apple Music account(s)")
+
         if self.config.use_wrapper:
-            if not self._check_wrapper_available():
+            wrapper_status = await self.probe_wrappers()
+            available_urls = [url for url, healthy in wrapper_status.items() if healthy]
+            if not available_urls:
                 raise RuntimeError(
-                    f"Wrapper service is not available at {self.config.wrapper_url}.\n"
+                    f"Wrapper service is not available at {', '.join(wrapper_status)}.\n"
                     "Please start the wrapper service:\n"
                     "  docker run -d -p 10020:10020 -p 20020:20020 -p 30020:30020 \\\n"
                     "    -v ./rootfs/data:/app/rootfs/data -e args='-H 0.0.0.0' wrapper"
                 )
-            logger.info(f"Wrapper service is available at {self.config.wrapper_url}")
-
-        self.base_downloader = AppleMusicBaseDownloader(
-            output_path=self.config.temp_path,
-            temp_path=self.config.temp_path,
-            use_wrapper=self.config.use_wrapper,
-            wrapper_decrypt_ip=self.config.wrapper_url,
-            mp4decrypt_path='mp4decrypt',
-            wvd_path=None,
-            save_cover=False,
-            save_playlist=False,
-            silent=True,
-            overwrite=True
-        )
+            for url, healthy in wrapper_status.items():
+                if not healthy:
+                    logger.warning(f"Wrapper service is not available at {url}, skipping until it recovers")
+            logger.info(f"Wrapper service is available at {', '.join(available_urls)}")
+
+        for endpoint in self.wrapper_endpoints:
+            self.base_downloaders[endpoint.url] = AppleMusicBaseDownloader(
+                output_path=self.config.temp_path,
+                temp_path=self.config.temp_path,
+                use_wrapper=self.config.use_wrapper,
+                wrapper_decrypt_ip=endpoint.url,
+                mp4decrypt_path='mp4decrypt',
+                wvd_path=None,
+                save_cover=False,
+                save_playlist=False,
+                silent=True,
+                overwrite=True
+            )
+        self.base_downloader = self.base_downloaders[self.wrapper_endpoints[0].url]
 
         requested_codec = self.normalize_codec(self.config.song_codec)
         effective_codec = self.effective_codec(requested_codec)
@@ -207,7 +551,8 @@ class DownloaderService:
         selected_codec = CODEC_MAP.get(effective_codec, SongCodec.AAC_LEGACY)
 
         self.downloader = self._create_downloader(selected_codec, include_lyrics=False)
-        self.downloaders[(effective_codec, False)] = self.downloader
+        self.stats['downloaders_created'] += 1
+        self.downloaders[(effective_codec, False, self.wrapper_endpoints[0].url, self.accounts[0].name)] = self.downloader
 
         if not self.base_downloader.full_mp4decrypt_path:
             raise RuntimeError(
@@ -216,119 +561,347 @@ class DownloaderService:
                 "  Ubuntu: sudo apt-get install bento4"
             )
 
-    def _create_downloader(self, codec: SongCodec, include_lyrics: bool = False) -> AppleMusicDownloader:
-        song_interface = AppleMusicSongInterface(self.interface)
+    def _create_downloader(
+        self,
+        codec: SongCodec,
+        include_lyrics: bool = False,
+        base_downloader: AppleMusicBaseDownloader | None = None,
+        interface: AppleMusicInterface | None = None
+    ) -> AppleMusicDownloader:
+        base_downloader = base_downloader or self.base_downloader
+        interface = interface or self.interface
+        song_interface = AppleMusicSongInterface(interface)
         song_downloader = AppleMusicSongDownloader(
-            base_downloader=self.base_downloader,
+            base_downloader=base_downloader,
             interface=song_interface,
             codec_priority=[codec],
             no_synced_lyrics=not include_lyrics
         )
 
-        music_video_interface = AppleMusicMusicVideoInterface(self.interface)
+        music_video_interface = AppleMusicMusicVideoInterface(interface)
         music_video_downloader = AppleMusicMusicVideoDownloader(
-            base_downloader=self.base_downloader,
+            base_downloader=base_downloader,
             interface=music_video_interface
         )
 
-        uploaded_video_interface = AppleMusicUploadedVideoInterface(self.interface)
+        uploaded_video_interface = AppleMusicUploadedVideoInterface(interface)
         uploaded_video_downloader = AppleMusicUploadedVideoDownloader(
-            base_downloader=self.base_downloader,
+            base_downloader=base_downloader,
             interface=uploaded_video_interface
         )
 
         return AppleMusicDownloader(
-            interface=self.interface,
-            base_downloader=self.base_downloader,
+            interface=interface,
+            base_downloader=base_downloader,
             song_downloader=song_downloader,
             music_video_downloader=music_video_downloader,
             uploaded_video_downloader=uploaded_video_downloader,
             skip_processing=False
         )
 
-    def _get_downloader(self, codec: str | None = None, include_lyrics: bool = False) -> AppleMusicDownloader:
-        requested_codec = self.effective_codec(codec)
-        key = (requested_codec, include_lyrics)
+    def _get_downloader(
+        self,
+        codec: str | None = None,
+        include_lyrics: bool = False,
+        endpoint: WrapperEndpoint | None = None,
+        account: AppleMusicAccount | None = None
+    ) -> AppleMusicDownloader:
+        requested_codec = self.normalize_codec(codec)
+        endpoint_url = (endpoint or self.wrapper_endpoints[0]).url
+        account = account or self.accounts[0]
+        key = (requested_codec, include_lyrics, endpoint_url, account.name)
+
+        downloader = self.downloaders.get(key)
+        if downloader:
+            self.downloaders.move_to_end(key)
+            self.stats['downloaders_reused'] += 1
+            return downloader
+
+        downloader = self._create_downloader(
+            CODEC_MAP.get(requested_codec, SongCodec.AAC_LEGACY),
+            include_lyrics=include_lyrics,
+            base_downloader=self.base_downloaders.get(endpoint_url),
+            interface=account.interface
+        )
+        self.stats['downloaders_created'] += 1
+        self.downloaders[key] = downloader
+        while len(self.downloaders) > DOWNLOADER_CACHE_MAX * (len(self.wrapper_endpoints) + len(self.accounts)):
+            self.downloaders.popitem(last=False)
+            self.stats['downloaders_evicted'] += 1
+        return downloader
+
+    def _is_legacy_stream(self, download_item: DownloadItem, codec: str) -> bool:
+        audio_track = getattr(download_item.stream_info, 'audio_track', None)
+        legacy = getattr(audio_track, 'legacy', None)
+        return codec in LEGACY_SONG_CODECS if legacy is None else bool(legacy)
+
+    async def _download_item(self, codec: str, download_item: DownloadItem, include_lyrics: bool = False):
+        if not self.config.use_wrapper or self._is_legacy_stream(download_item, codec):
+            await self._get_downloader(codec, include_lyrics=include_lyrics).download(download_item)
+            return
+
+        endpoint = self._select_endpoint()
+        if not endpoint:
+            raise CodecUnavailableError(f"{codec.upper()} is not available: no wrapper endpoint is accepting requests")
+        endpoint.outstanding += 1
+        try:
+            await self._get_downloader(codec, include_lyrics=include_lyrics, endpoint=endpoint).download(download_item)
+        except Exception as e:
+            if self._is_wrapper_error(e, endpoint):
+                endpoint.breaker.record_failure()
+            else:
+                endpoint.breaker.release()
+            raise
+        finally:
+            endpoint.outstanding -= 1
+        endpoint.completed += 1
+        endpoint.breaker.record_success()
+
+    async def _get_codec_availability(self, track_id: str) -> dict[str, bool]:
+        if not self.cache:
+            return {}
+        try:
+            return await self.cache.get_codec_availability(track_id)
+        except Exception as e:
+            logger.warning(f"[{track_id}] Failed to read codec availability: {e}")
+            return {}
+
+    def _record_codec_availability(self, track_id: str, codec: str, available: bool):
+        if self.cache:
+            self.cache.set_codec_availability(track_id, codec, available)
+
+    def _codec_preference(self, requested_codec: str) -> list[str]:
+        if requested_codec in WRAPPER_REQUIRED_CODECS:
+            chain = ['aac', *AAC_FALLBACK_CHAIN['aac']]
+        else:
+            chain = AAC_FALLBACK_CHAIN.get(requested_codec, [])
+        preference = [requested_codec]
+        for codec in chain:
+            if codec not in preference:
+                preference.append(codec)
+        return preference
+
+    async def _probe_available_codecs(self, download_item: DownloadItem) -> set[str] | None:
+        track_id = download_item.media_metadata['id']
+        extended_asset_urls = download_item.media_metadata.get('attributes', {}).get('extendedAssetUrls')
+        if extended_asset_urls is None:
+            return None
+
+        available = set(LEGACY_SONG_CODECS)
+        m3u8_master_url = extended_asset_urls.get('enhancedHls')
+        if not m3u8_master_url:
+            return available
+
+        self.stats['codec_probes'] += 1
+        try:
+            m3u8_master_data = m3u8.loads((await get_response(m3u8_master_url)).text).data
+        except Exception as e:
+            self.stats['codec_probe_failures'] += 1
+            logger.warning(f"[{track_id}] Failed to probe available streams: {e}")
+            return None
 
-        if key not in self.downloaders:
-            self.downloaders[key] = self._create_downloader(
-                CODEC_MAP.get(requested_codec, SongCodec.AAC_LEGACY),
-                include_lyrics=include_lyrics
+        for playlist in m3u8_master_data.get('playlists', []):
+            audio = playlist.get('stream_info', {}).get('audio')
+            if not audio:
+                continue
+            for codec, pattern in SONG_CODEC_REGEX_MAP.items():
+                if re.fullmatch(pattern, audio):
+                    available.add(codec)
+        return available
+
+    def _first_candidate(self, candidates: list[str], known: dict[str, bool]) -> str | None:
+        for codec in candidates:
+            if known.get(codec) is False:
+                self.stats['codec_skips'] += 1
+                continue
+            return codec
+        return None
+
+    async def plan_codec(
+        self,
+        download_item: DownloadItem,
+        requested_codec: str,
+        known: dict[str, bool] | None = None,
+        probed: bool = False
+    ) -> CodecPlan:
+        track_id = download_item.media_metadata['id']
+        known = dict(known or {})
+        self.stats['codec_plans'] += 1
+        candidates = [
+            codec for codec in self._codec_preference(self.effective_codec(requested_codec))
+            if codec in LEGACY_SONG_CODECS or self.is_wrapper_healthy()
+        ]
+
+        codec = self._first_candidate(candidates, known)
+        if not probed and codec and codec not in LEGACY_SONG_CODECS and codec not in known:
+            probed = True
+            available = await self._probe_available_codecs(download_item)
+            if available is not None:
+                for candidate in candidates:
+                    if candidate not in LEGACY_SONG_CODECS:
+                        known[candidate] = candidate in available
+                        self._record_codec_availability(track_id, candidate, known[candidate])
+                codec = self._first_candidate(candidates, known)
+
+        if not codec:
+            return CodecPlan(
+                None,
+                f"No available stream among: {', '.join(c.upper() for c in candidates)}",
+                known,
+                probed
             )
-        return self.downloaders[key]
 
-    def _create_fallback_downloader(self, codec: SongCodec, include_lyrics: bool = False) -> AppleMusicDownloader:
-        return self._create_downloader(codec, include_lyrics=include_lyrics)
+        reason = None
+        if codec != requested_codec:
+            reason = f"⚠️ {requested_codec.upper()} not available, using {codec.upper()} instead"
+        logger.info(f"[{track_id}] Codec plan: {codec.upper()} (requested {requested_codec.upper()})")
+        return CodecPlan(codec, reason, known, probed)
 
-    async def _try_aac_fallback_chain(
+    async def _build_planned_item(
         self,
         download_item: DownloadItem,
         url_info: UrlInfo,
-        primary_codec: str,
-        track_id: str,
-        track_artist: str,
-        track_title: str,
+        codec: str,
         include_lyrics: bool = False
-    ) -> tuple[DownloadItem, str]:
-        fallback_chain = AAC_FALLBACK_CHAIN.get(primary_codec, [])
-        if not fallback_chain:
-            raise Exception(
-                f"Track '{track_artist} - {track_title}' is not available in {primary_codec.upper()} format."
-            )
+    ) -> DownloadItem:
+        track_id = download_item.media_metadata['id']
+        if not url_info:
+            track_url = download_item.media_metadata.get('attributes', {}).get('url', '')
+            if track_url:
+                url_info = self._get_downloader(codec, include_lyrics=include_lyrics).get_url_info(track_url)
+        if not url_info:
+            raise Exception(f"Cannot build {codec.upper()} download queue for track {track_id}: URL not available")
+
+        planned_queue = await self.get_download_queue(url_info, codec, include_lyrics)
+        planned_item = planned_queue[0] if planned_queue else None
+        if not planned_item:
+            raise Exception(f"Empty {codec.upper()} download queue for track {track_id}")
+        if planned_item.error:
+            raise planned_item.error
+        if not planned_item.stream_info:
+            self._record_codec_availability(track_id, codec, False)
+            raise CodecUnavailableError(f"{codec.upper()} stream not available for track {track_id}")
+        return planned_item
 
-        attempted_codecs = [primary_codec]
+    def parse_url(self, url: str) -> UrlInfo | None:
+        return self.downloader.get_url_info(url)
 
-        for fallback_codec_str in fallback_chain:
-            attempted_codecs.append(fallback_codec_str)
-            logger.warning(f"[{track_id}] {primary_codec.upper()} not available, trying {fallback_codec_str.upper()}")
+    def get_track_id(self, url_info: UrlInfo) -> str | None:
+        if url_info.sub_id:
+            return url_info.sub_id
+        if url_info.type in SONG_MEDIA_TYPE:
+            return url_info.id
+        return None
+
+    def get_collection_key(self, url_info: UrlInfo) -> tuple[str, str] | None:
+        if url_info.sub_id:
+            return None
+        collection_type = url_info.type or url_info.library_type
+        if collection_type not in ALBUM_MEDIA_TYPE | PLAYLIST_MEDIA_TYPE:
+            return None
+        collection_id = url_info.id or url_info.library_id
+        storefront = (
+            url_info.storefront or
+            url_info.library_storefront or
+            self.apple_music_api.storefront
+        )
+        if not collection_id or not storefront:
+            return None
+        return collection_id, storefront
 
-            fallback_codec = CODEC_MAP.get(fallback_codec_str, SongCodec.AAC_LEGACY)
+    def _download_queue_key(self, url_info: UrlInfo, codec: str | None, include_lyrics: bool) -> tuple:
+        return (
+            "song" if url_info.sub_id else url_info.type or url_info.library_type,
+            url_info.sub_id or url_info.id or url_info.library_id,
+            url_info.storefront or url_info.library_storefront,
+            self.normalize_codec(codec),
+            include_lyrics,
+        )
 
-            try:
-                fallback_downloader = self._create_fallback_downloader(
-                    fallback_codec,
-                    include_lyrics=include_lyrics
+    def _clone_download_item(self, item: DownloadItem) -> DownloadItem:
+        clone = copy.copy(item)
+        if item.random_uuid:
+            clone.random_uuid = self.base_downloader.get_random_uuid()
+            if item.staged_path:
+                clone.staged_path = item.staged_path.replace(
+                    TEMP_PATH_TEMPLATE.format(item.random_uuid),
+                    TEMP_PATH_TEMPLATE.format(clone.random_uuid)
                 )
-
-                if not url_info:
-                    track_url = download_item.media_metadata.get('attributes', {}).get('url', '')
-                    if track_url:
-                        url_info = fallback_downloader.get_url_info(track_url)
-
-                if not url_info:
-                    logger.error(f"[{track_id}] Cannot try {fallback_codec_str}: URL not available")
-                    continue
-
-                fallback_queue = await fallback_downloader.get_download_queue(url_info)
-                if not fallback_queue:
-                    logger.error(f"[{track_id}] Failed to create queue for {fallback_codec_str}")
-                    continue
-
-                fallback_item = fallback_queue[0]
-
-                if not fallback_item.stream_info:
-                    logger.warning(f"[{track_id}] {fallback_codec_str.upper()} stream not available")
+        return clone
+
+    def _clone_download_queue(self, download_queue: list[DownloadItem] | None) -> list[DownloadItem] | None:
+        if download_queue is None:
+            return None
+        return [self._clone_download_item(item) for item in download_queue]
+
+    def _remember_download_queue(self, key: tuple, download_queue: list[DownloadItem]):
+        now = time.monotonic()
+        if len(self.queue_results) >= DOWNLOAD_QUEUE_CACHE_MAX:
+            self.queue_results = {
+                cached_key: cached for cached_key, cached in self.queue_results.items()
+                if cached[0] > now
+            }
+        self.queue_results[key] = (now + self.config.download_queue_cache_seconds, download_queue)
+
+    async def _fetch_download_queue(
+        self,
+        key: tuple,
+        url_info: UrlInfo,
+        codec: str | None,
+        include_lyrics: bool
+    ) -> list[DownloadItem]:
+        try:
+            attempted = set()
+            token_refreshed = False
+            while True:
+                account = self._select_account(attempted)
+                attempted.add(account.name)
+                can_retry = len(attempted) < len(self.accounts)
+
+                await account.limiter.acquire()
+                account.outstanding += 1
+                try:
+                    download_queue = await self._get_downloader(
+                        codec,
+                        include_lyrics=include_lyrics,
+                        account=account
+                    ).get_download_queue(url_info)
+                except Exception as e:
+                    if self._is_token_error(e) and not token_refreshed:
+                        token_refreshed = True
+                        await self.refresh_developer_token(force=True, stale_token=account.apple_music_api.token)
+                        continue
+                    if not self._is_license_error(e):
+                        raise
+                    self._quarantine_account(account, e)
+                    if not can_retry:
+                        raise
+                    self.stats['account_retries'] += 1
                     continue
-
-                logger.info(f"[{track_id}] Downloading with {fallback_codec_str.upper()}...")
-                await fallback_downloader.download(fallback_item)
-
-                logger.info(f"[{track_id}] Successfully downloaded with {fallback_codec_str.upper()}")
-                fallback_message = f"⚠️ {primary_codec.upper()} not available, using {fallback_codec_str.upper()} instead"
-                return fallback_item, fallback_message
-
-            except Exception as e:
-                logger.warning(f"[{track_id}] {fallback_codec_str.upper()} failed: {e}")
-                continue
-
-        raise Exception(
-            f"Track '{track_artist} - {track_title}' is not available in any AAC format. "
-            f"Attempted: {', '.join(attempted_codecs)}. "
-            "This track may not be available in your region or subscription tier."
-        )
-
-    def parse_url(self, url: str) -> UrlInfo | None:
-        return self.downloader.get_url_info(url)
+                finally:
+                    account.outstanding -= 1
+
+                account.requests += 1
+                if download_queue:
+                    if not token_refreshed and any(self._is_token_error(item.error) for item in download_queue):
+                        token_refreshed = True
+                        await self.refresh_developer_token(force=True, stale_token=account.apple_music_api.token)
+                        continue
+                    license_error = next(
+                        (item.error for item in download_queue if item.error and self._is_license_error(item.error)),
+                        None
+                    )
+                    if license_error:
+                        self._quarantine_account(account, license_error)
+                        if can_retry:
+                            self.stats['account_retries'] += 1
+                            continue
+
+                if download_queue and self.config.download_queue_cache_seconds > 0:
+                    self._remember_download_queue(key, download_queue)
+                return download_queue
+        finally:
+            self.queue_inflight.pop(key, None)
 
     async def get_download_queue(
         self,
@@ -336,7 +909,23 @@ class DownloaderService:
         codec: str | None = None,
         include_lyrics: bool = False
     ) -> list[DownloadItem]:
-        return await self._get_downloader(codec, include_lyrics=include_lyrics).get_download_queue(url_info)
+        key = self._download_queue_key(url_info, codec, include_lyrics)
+
+        cached = self.queue_results.get(key)
+        if cached and cached[0] > time.monotonic():
+            self.stats['queue_cache_hits'] += 1
+            return self._clone_download_queue(cached[1])
+
+        task = self.queue_inflight.get(key)
+        if task:
+            self.stats['queue_coalesced'] += 1
+            logger.info(f"Joining in-flight metadata fetch for {key[0]} {key[1]}")
+        else:
+            self.stats['queue_fetches'] += 1
+            task = asyncio.create_task(self._fetch_download_queue(key, url_info, codec, include_lyrics))
+            self.queue_inflight[key] = task
+
+        return self._clone_download_queue(await asyncio.shield(task))
 
     async def download_track(
         self,
@@ -344,130 +933,74 @@ class DownloaderService:
         url_info: UrlInfo = None,
         codec: str | None = None,
         include_lyrics: bool = False
-    ) -> tuple[str, str | None]:
-        fallback_message = None
-        high_quality_codecs = ['atmos', 'alac']
-        requested_codec = self.effective_codec(codec)
+    ) -> tuple[str, str | None, str]:
+        built_codec = self.normalize_codec(codec)
 
         track_title = download_item.media_tags.title
         track_artist = download_item.media_tags.artist
         track_id = download_item.media_metadata['id']
 
-        logger.info(f"[{track_id}] Starting download: {track_artist} - {track_title} (codec: {requested_codec.upper()})")
+        logger.info(f"[{track_id}] Starting download: {track_artist} - {track_title} (codec: {built_codec.upper()})")
+        known = await self._get_codec_availability(track_id)
+        plan = await self.plan_codec(download_item, built_codec, known)
 
-        try:
-            await self._get_downloader(requested_codec, include_lyrics=include_lyrics).download(download_item)
-            logger.info(f"[{track_id}] Download completed: {track_artist} - {track_title}")
-        except Exception as e:
-            error_msg = str(e).lower()
-
-            if 'license exchange' in error_msg or 'status":-1002' in error_msg:
-                logger.error(f"[{track_id}] DRM license authentication failed: {e}")
-                raise Exception(
-                    f"DRM authentication failed for '{track_artist} - {track_title}'. "
-                    "Please re-authenticate the wrapper service:\n"
-                    "1. Stop wrapper: docker ps | grep wrapper && docker stop <container_id>\n"
-                    "2. Clear auth: bash clear_wrapper_auth.sh\n"
-                    "3. Restart wrapper and re-authenticate"
+        while plan.codec:
+            try:
+                if (
+                    plan.codec == built_codec and
+                    self._is_legacy_stream(download_item, plan.codec) == (plan.codec in LEGACY_SONG_CODECS)
+                ):
+                    planned_item = download_item
+                else:
+                    planned_item = await self._build_planned_item(
+                        download_item, url_info, plan.codec, include_lyrics=include_lyrics
+                    )
+                logger.info(f"[{track_id}] Downloading with {plan.codec.upper()}...")
+                await self._download_item(plan.codec, planned_item, include_lyrics=include_lyrics)
+            except Exception as e:
+                if self._is_license_error(e):
+                    logger.error(f"[{track_id}] DRM license authentication failed: {e}")
+                    raise self._license_error(track_artist, track_title)
+                if not self.is_recoverable_codec_error(e):
+                    raise
+                logger.warning(f"[{track_id}] {plan.codec.upper()} download failed: {e}")
+                if isinstance(e, FormatNotAvailable):
+                    self._record_codec_availability(track_id, plan.codec, False)
+                plan = await self.plan_codec(
+                    download_item, built_codec, {**plan.known, plan.codec: False}, plan.probed
                 )
+                continue
 
-            is_format_unavailable = self.is_recoverable_codec_error(e)
+            self._record_codec_availability(track_id, plan.codec, True)
+            break
 
-            if isinstance(e, FormatNotAvailable):
-                has_enhanced_hls = (
-                    download_item.media_metadata.get('attributes', {})
-                    .get('extendedAssetUrls', {})
-                    .get('enhancedHls') is not None
+        if not plan.codec:
+            self.stats['codec_plan_fallbacks'] += 1
+            has_enhanced_hls = (
+                download_item.media_metadata.get('attributes', {})
+                .get('extendedAssetUrls', {})
+                .get('enhancedHls') is not None
+            )
+            if not has_enhanced_hls:
+                logger.error(
+                    f"[{track_id}] Track not available: No enhanced HLS streams in metadata. "
+                    "This track may not be available in your region or with your subscription."
                 )
-
-                if not has_enhanced_hls:
-                    logger.error(
-                        f"[{track_id}] Track not available: No enhanced HLS streams in metadata. "
-                        "This track may not be available in your region or with your subscription."
-                    )
-                    raise Exception(
-                        f"Track '{track_artist} - {track_title}' is not available for download. "
-                        "It may not be available in your region or subscription tier."
-                    )
-
-            if requested_codec in high_quality_codecs and is_format_unavailable:
-                logger.warning(f"[{track_id}] {requested_codec.upper()} not available, falling back to AAC")
-                fallback_message = f"⚠️ {requested_codec.upper()} not available, using AAC instead"
-
-                fallback_downloader = self._create_fallback_downloader(
-                    SongCodec.AAC,
-                    include_lyrics=include_lyrics
+                raise Exception(
+                    f"Track '{track_artist} - {track_title}' is not available for download. "
+                    "It may not be available in your region or subscription tier."
                 )
+            logger.warning(f"[{track_id}] {plan.reason}")
+            raise Exception(
+                f"Track '{track_artist} - {track_title}' is not available in any supported format. "
+                f"Attempted: {', '.join(self._codec_preference(built_codec))}. "
+                "This track may not be available in your region or subscription tier."
+            )
 
-                if not url_info:
-                    track_url = download_item.media_metadata.get('attributes', {}).get('url', '')
-                    if track_url:
-                        url_info = fallback_downloader.get_url_info(track_url)
-
-                if not url_info:
-                    logger.error(f"[{track_id}] Cannot fallback: URL not available")
-                    raise
-
-                logger.info(f"[{track_id}] Creating fallback download queue...")
-                fallback_queue = await fallback_downloader.get_download_queue(url_info)
-                if fallback_queue:
-                    fallback_item = fallback_queue[0]
-
-                    if not fallback_item.stream_info:
-                        logger.warning(
-                            f"[{track_id}] AAC stream not available, trying legacy AAC..."
-                        )
-                        download_item, fallback_message = await self._try_aac_fallback_chain(
-                            fallback_item, url_info, 'aac',
-                            track_id, track_artist, track_title,
-                            include_lyrics=include_lyrics
-                        )
-                    else:
-                        logger.info(f"[{track_id}] Fallback queue created, downloading with AAC codec...")
-                        try:
-                            await fallback_downloader.download(fallback_item)
-                            logger.info(f"[{track_id}] AAC fallback download completed: {track_artist} - {track_title}")
-                            download_item = fallback_item
-                        except Exception as fallback_error:
-                            fallback_error_msg = str(fallback_error).lower()
-
-                            if 'license exchange' in fallback_error_msg or 'status":-1002' in fallback_error_msg:
-                                logger.error(f"[{track_id}] AAC fallback: DRM license authentication failed: {fallback_error}")
-                                raise Exception(
-                                    f"DRM authentication failed for '{track_artist} - {track_title}'. "
-                                    "Please re-authenticate the wrapper service:\n"
-                                    "1. Stop wrapper: docker ps | grep wrapper && docker stop <container_id>\n"
-                                    "2. Clear auth: bash clear_wrapper_auth.sh\n"
-                                    "3. Restart wrapper and re-authenticate"
-                                )
-
-                            if isinstance(fallback_error, FormatNotAvailable):
-                                logger.warning(
-                                    f"[{track_id}] AAC fallback failed, trying legacy AAC..."
-                                )
-                                download_item, fallback_message = await self._try_aac_fallback_chain(
-                                    fallback_item, url_info, 'aac',
-                                    track_id, track_artist, track_title,
-                                    include_lyrics=include_lyrics
-                                )
-                            else:
-                                logger.error(f"[{track_id}] AAC fallback download failed with unexpected error: {fallback_error}")
-                                raise
-                else:
-                    logger.error(f"[{track_id}] Failed to create fallback download queue")
-                    raise Exception(f"Failed to create fallback download queue for track {track_id}")
-
-            elif requested_codec in AAC_FALLBACK_CHAIN and is_format_unavailable:
-                try:
-                    download_item, fallback_message = await self._try_aac_fallback_chain(
-                        download_item, url_info, requested_codec,
-                        track_id, track_artist, track_title,
-                        include_lyrics=include_lyrics
-                    )
-                except Exception:
-                    raise
-            else:
-                raise
+        download_item = planned_item
+        delivered_codec = plan.codec
+        fallback_message = plan.reason
+        logger.info(f"[{track_id}] Download completed: {track_artist} - {track_title} ({delivered_codec.upper()})")
 
         final_path = Path(download_item.final_path)
         if not final_path.is_absolute():
@@ -477,9 +1010,12 @@ class DownloaderService:
             raise FileNotFoundError(f"Downloaded file not found at: {final_path}")
 
         file_size_mb = final_path.stat().st_size / 1024 / 1024
-        logger.info(f"[{track_id}] File ready: {final_path.name} ({file_size_mb:.2f} MB)")
+        logger.info(
+            f"[{track_id}] File ready: {final_path.name} ({file_size_mb:.2f} MB, "
+            f"codec: {delivered_codec.upper()})"
+        )
 
-        return str(final_path), fallback_message
+        return str(final_path), fallback_message, delivered_codec
 
     def extract_metadata(self, download_item: DownloadItem) -> dict:
         cover_url = None
@@ -490,8 +1026,11 @@ class DownloaderService:
             if artwork and artwork.get('url'):
                 cover_url = artwork['url'].format(w=1200, h=1200)
 
+        albums = download_item.media_metadata.get('relationships', {}).get('albums', {}).get('data') or []
+
         return {
             'apple_music_id': download_item.media_metadata['id'],
+            'album_id': albums[0].get('id') if albums else None,
             'url': download_item.media_metadata.get('attributes', {}).get('url', ''),
             'title': download_item.media_tags.title,
             'artist': download_item.media_tags.artist,
@@ -53,9 +53,12 @@ async def watchdog_loop(application):
 async def health_check_loop(application):
     config = application.bot_data.get('config')
     downloader = application.bot_data.get('downloader')
+    cache = application.bot_data.get('cache')
+    concurrency = application.bot_data.get('concurrency')
+    rate_limiter = application.bot_data.get('rate_limiter')
     interval = getattr(config, 'health_check_interval_seconds', 300) if config else 300
     bot_was_healthy = True
-    wrapper_was_healthy = True
+    wrapper_was_healthy: dict[str, bool] = {}
 
     while True:
         await asyncio.sleep(interval)
@@ -72,20 +75,33 @@ async def health_check_loop(application):
             bot_was_healthy = False
             systemd_notify(f"STATUS=Bot health check failed: {type(e).__name__}")
 
+        if cache:
+            logger.info(f"Song cache stats: {cache.get_stats()}")
+        if concurrency:
+            logger.info(f"Download scheduler stats: {concurrency.get_stats()}")
+        if rate_limiter:
+            logger.info(f"Telegram rate limiter stats: {rate_limiter.get_stats()}")
+        if downloader:
+            logger.info(f"Downloader stats: {downloader.stats}")
+            logger.info(f"Apple Music accounts: {downloader.account_stats()}")
+            if getattr(config, 'use_wrapper', False):
+                logger.info(f"Wrapper endpoints: {downloader.wrapper_stats()}")
+
         if not getattr(config, 'use_wrapper', False):
             continue
 
         try:
-            wrapper_healthy = bool(downloader and downloader._check_wrapper_available())
+            wrapper_status = await downloader.probe_wrappers() if downloader else {}
         except Exception as e:
             logger.warning(f"Wrapper health check raised: {e}")
-            wrapper_healthy = False
-
-        if wrapper_healthy and not wrapper_was_healthy:
-            logger.info(f"Wrapper health restored: {config.wrapper_url}")
-            await notify_admins(application, f"Wrapper health restored: {config.wrapper_url}")
-        elif not wrapper_healthy and wrapper_was_healthy:
-            logger.warning(f"Wrapper health check failed: {config.wrapper_url}")
-            await notify_admins(application, f"Wrapper health check failed: {config.wrapper_url}")
-
-        wrapper_was_healthy = wrapper_healthy
+            wrapper_status = {url: False for url in config.wrapper_urls}
+
+        for wrapper_url, wrapper_healthy in wrapper_status.items():
+            was_healthy = wrapper_was_healthy.get(wrapper_url, True)
+            if wrapper_healthy and not was_healthy:
+                logger.info(f"Wrapper health restored: {wrapper_url}")
+                await notify_admins(application, f"Wrapper health restored: {wrapper_url}")
+            elif not wrapper_healthy and was_healthy:
+                logger.warning(f"Wrapper health check failed: {wrapper_url}")
+                await notify_admins(application, f"Wrapper health check failed: {wrapper_url}")
+            wrapper_was_healthy[wrapper_url] = wrapper_healthy
@@ -0,0 +1,166 @@
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Any, Callable, Coroutine, Optional
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+
+logger = logging.getLogger(__name__)
+
+CHAT_LIMITED_ENDPOINT_PREFIXES = ("send", "copy", "forward")
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, tokens: float = 1) -> float:
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        return max(0.0, (tokens - self.tokens) / self.rate)
+
+    async def acquire(self, tokens: float = 1):
+        if self.rate <= 0:
+            return
+        async with self.lock:
+            while True:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+    def block(self, seconds: float):
+        if self.rate <= 0:
+            return
+        self._refill()
+        self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+    def charge(self, tokens: float):
+        if self.rate <= 0 or tokens <= 0:
+            return
+        self._refill()
+        self.tokens -= tokens
+
+
+class TelegramRateLimiter(BaseRateLimiter):
+    def __init__(
+        self,
+        global_per_second: float = 30,
+        private_chat_per_second: float = 1,
+        group_chat_per_minute: float = 20,
+        max_retries: int = 3,
+        max_chats: int = 4096
+    ):
+        self.global_bucket = TokenBucket(global_per_second, global_per_second)
+        self.private_chat_per_second = private_chat_per_second
+        self.group_chat_per_second = group_chat_per_minute / 60
+        self.max_retries = max_retries
+        self.max_chats = max_chats
+        self.chat_buckets: OrderedDict[str, TokenBucket] = OrderedDict()
+        self.waiting = 0
+        self.stats = {
+            'requests': 0,
+            'throttled': 0,
+            'wait_seconds': 0.0,
+            'max_wait_seconds': 0.0,
+            'max_waiting': 0,
+            'retry_after': 0,
+            'retry_after_seconds': 0.0,
+        }
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        key = str(chat_id)
+        bucket = self.chat_buckets.get(key)
+        if not bucket:
+            is_private = isinstance(chat_id, int) and chat_id > 0
+            rate = self.private_chat_per_second if is_private else self.group_chat_per_second
+            bucket = TokenBucket(rate, 1)
+            self.chat_buckets[key] = bucket
+        self.chat_buckets.move_to_end(key)
+        while len(self.chat_buckets) > self.max_chats:
+            self.chat_buckets.popitem(last=False)
+        return bucket
+
+    async def _acquire(self, chat_bucket: Optional[TokenBucket], messages: int):
+        started = time.monotonic()
+        self.waiting += 1
+        self.stats['max_waiting'] = max(self.stats['max_waiting'], self.waiting)
+        try:
+            if chat_bucket:
+                await chat_bucket.acquire()
+                chat_bucket.charge(messages - 1)
+            await self.global_bucket.acquire()
+            self.global_bucket.charge(messages - 1)
+        finally:
+            self.waiting -= 1
+
+        waited = time.monotonic() - started
+        self.stats['requests'] += 1
+        if waited > 0.01:
+            self.stats['throttled'] += 1
+            self.stats['wait_seconds'] += waited
+            self.stats['max_wait_seconds'] = max(self.stats['max_wait_seconds'], waited)
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Any]],
+        args: Any,
+        kwargs: dict[str, Any],
+        endpoint: str,
+        data: dict[str, Any],
+        rate_limit_args: Optional[Any]
+    ):
+        if endpoint == "getUpdates":
+            return await callback(*args, **kwargs)
+
+        chat_id = data.get('chat_id')
+        chat_bucket = None
+        if (
+            chat_id is not None and
+            endpoint.startswith(CHAT_LIMITED_ENDPOINT_PREFIXES) and
+            endpoint != "sendChatAction"
+        ):
+            chat_bucket = self._chat_bucket(chat_id)
+        messages = max(1, len(data.get('media') or [])) if endpoint == "sendMediaGroup" else 1
+
+        for attempt in range(self.max_retries + 1):
+            await self._acquire(chat_bucket, messages)
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                if attempt == self.max_retries:
+                    raise
+                retry_after = e.retry_after
+                if isinstance(retry_after, timedelta):
+                    retry_after = retry_after.total_seconds()
+                self.stats['retry_after'] += 1
+                self.stats['retry_after_seconds'] += retry_after
+                logger.warning(f"Flood control on {endpoint} for chat {chat_id}, retrying in {retry_after}s")
+                (chat_bucket or self.global_bucket).block(retry_after)
+
+    def get_stats(self) -> dict:
+        return {
+            **self.stats,
+            'waiting': self.waiting,
+            'chats': len(self.chat_buckets),
+        }
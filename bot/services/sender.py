@@ -1,4 +1,5 @@
 import httpx
+import importlib.util
 import logging
 import asyncio
 import random
@@ -8,17 +9,41 @@ from telegram.ext import ContextTypes
 from pathlib import Path
 from typing import Optional, Callable
 from mutagen.mp4 import MP4
+from PIL import Image
+from io import BytesIO
 from difflib import SequenceMatcher
 from urllib.parse import quote_plus
 import re
+from .cover_cache import CoverCache
 
 logger = logging.getLogger(__name__)
 
+HTTP_MAX_CONNECTIONS = 20
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 10
+HTTP_KEEPALIVE_EXPIRY_SECONDS = 30.0
+THUMBNAIL_MAX_DIMENSION = 320
+THUMBNAIL_MAX_BYTES = 200 * 1024
+THUMBNAIL_JPEG_QUALITIES = (90, 80, 70, 60, 50)
+
 
 class SenderService:
-    def __init__(self):
+    def __init__(self, cover_cache: Optional[CoverCache] = None):
+        self.cover_cache = cover_cache
         self.upload_tracker: dict[str, asyncio.Event] = {}
         self.upload_lock = asyncio.Lock()
+        self.http_client = httpx.AsyncClient(
+            http2=importlib.util.find_spec("h2") is not None,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SECONDS
+            ),
+            timeout=httpx.Timeout(10.0, connect=5.0),
+            follow_redirects=True
+        )
+
+    async def close(self):
+        await self.http_client.aclose()
 
     async def acquire_upload_lock(self, track_id: str) -> bool:
         async with self.upload_lock:
@@ -197,29 +222,68 @@ class SenderService:
         if metadata:
             song_info = f" for '{metadata.get('title', 'Unknown')}' by '{metadata.get('artist', 'Unknown')}'"
 
-        if metadata and metadata.get('title') and metadata.get('artist'):
-            logger.debug(f"Attempting iTunes Search{song_info}")
-            thumbnail = await self._search_itunes_cover(
-                title=metadata['title'],
-                artist=metadata['artist'],
-                album=metadata.get('album')
-            )
-            if thumbnail:
-                logger.info(f"Successfully got cover from iTunes Search{song_info}")
-                return thumbnail
-            logger.warning(f"iTunes Search failed{song_info}")
+        async def fetch():
+            if file_path:
+                thumbnail = await asyncio.to_thread(self._thumbnail_from_file, file_path)
+                if thumbnail:
+                    logger.debug(f"Built thumbnail from embedded cover{song_info}")
+                    return thumbnail
+
+            if metadata and metadata.get('title') and metadata.get('artist'):
+                logger.debug(f"Attempting iTunes Search{song_info}")
+                thumbnail = await self._search_itunes_cover(
+                    title=metadata['title'],
+                    artist=metadata['artist'],
+                    album=metadata.get('album')
+                )
+                if thumbnail:
+                    logger.info(f"Successfully got cover from iTunes Search{song_info}")
+                    return thumbnail
+                logger.warning(f"iTunes Search failed{song_info}")
+            return None
+
+        cover_key = None
+        if metadata and metadata.get('album_id'):
+            cover_key = f"album:{metadata['album_id']}"
+        elif cover_url:
+            cover_key = f"artwork:{cover_url}"
+
+        if self.cover_cache and cover_key:
+            thumbnail = await self.cover_cache.get_or_fetch(cover_key, fetch)
+        else:
+            thumbnail = await fetch()
+        if thumbnail:
+            return thumbnail
 
         logger.warning(f"No thumbnail available{song_info}")
         return None
 
+    def _thumbnail_from_file(self, file_path: str) -> Optional[bytes]:
+        cover_data = self._extract_cover_from_file(file_path)
+        if not cover_data:
+            return None
+        try:
+            with Image.open(BytesIO(cover_data)) as image:
+                image = image.convert('RGB')
+                image.thumbnail((THUMBNAIL_MAX_DIMENSION, THUMBNAIL_MAX_DIMENSION), Image.Resampling.LANCZOS)
+                for quality in THUMBNAIL_JPEG_QUALITIES:
+                    buffer = BytesIO()
+                    image.save(buffer, format='JPEG', quality=quality, optimize=True)
+                    if buffer.tell() <= THUMBNAIL_MAX_BYTES:
+                        return buffer.getvalue()
+        except Exception as e:
+            logger.warning(f"Failed to build thumbnail from {file_path}: {type(e).__name__}: {e}")
+            return None
+        logger.warning(f"Embedded cover in {file_path} does not fit in {THUMBNAIL_MAX_BYTES // 1024} KB")
+        return None
+
     async def _download_cover(self, cover_url: str) -> Optional[bytes]:
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(cover_url, timeout=10.0)
-                response.raise_for_status()
-                size_kb = len(response.content) / 1024
-                logger.debug(f"Downloaded cover from URL (size: {size_kb:.1f} KB)")
-                return response.content
+            response = await self.http_client.get(cover_url, timeout=10.0)
+            response.raise_for_status()
+            size_kb = len(response.content) / 1024
+            logger.debug(f"Downloaded cover from URL (size: {size_kb:.1f} KB)")
+            return response.content
         except httpx.HTTPStatusError as e:
             logger.warning(f"HTTP error {e.response.status_code} downloading cover from {cover_url}")
             return None
@@ -316,10 +380,9 @@ class SenderService:
 
             logger.debug(f"Searching iTunes with query: '{query}'")
 
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, timeout=8.0)
-                response.raise_for_status()
-                data = response.json()
+            response = await self.http_client.get(url, timeout=8.0)
+            response.raise_for_status()
+            data = response.json()
 
             results = data.get('results', [])
             result_count = len(results)